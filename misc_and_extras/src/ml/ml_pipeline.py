@@ -11,23 +11,69 @@ This script performs:
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('agg')  # figures are only saved to PNG, never shown
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
+
+# Route supported estimators through Intel's oneDAL backend when the
+# extension is installed; must run before the sklearn imports below
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn()
+except ImportError:  # sklearnex is optional, stock scikit-learn is used without it
+    pass
+
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (enables HalvingGridSearchCV)
+from sklearn.model_selection import (
+    train_test_split, GridSearchCV, HalvingGridSearchCV, RandomizedSearchCV, cross_val_score
+)
 from sklearn.preprocessing import StandardScaler
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    confusion_matrix, classification_report, roc_auc_score, roc_curve
+    classification_report, roc_auc_score, roc_curve
 )
 from sklearn.tree import export_text, plot_tree
+from sklearn.pipeline import make_pipeline
 import joblib
 import json
+import pickle
+import sys
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:  # pyarrow is optional, pandas' C parser reads the same dtypes
+    CSV_ENGINE = 'c'
+
+# Flash available for the C model's node arrays on an ATmega328P (32 KB in
+# total, leaving room for the firmware); larger exports are ESP32-only
+ATMEGA_MODEL_BUDGET = 24 * 1024
+
+# Features only need float32 and the label fits in int8
+CSV_DTYPES = {'Temp': 'float32', 'Humidity': 'float32', 'LDR': 'float32', 'Heater': 'int8'}
+
+try:
+    import lz4.frame  # noqa: F401
+    MODEL_COMPRESSION = ('lz4', 3)
+except ImportError:  # lz4 is optional, the model is saved uncompressed without it
+    MODEL_COMPRESSION = 0
+
+try:
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:  # skl2onnx is optional, the ONNX export is skipped without it
+    convert_sklearn = None
+
+try:
+    import tensorflow as tf
+except ImportError:  # TensorFlow is optional, the TFLite export is skipped without it
+    tf = None
+
 # Set style for better visualizations
 sns.set_style("whitegrid")
 plt.rcParams['figure.figsize'] = (12, 6)
@@ -39,6 +85,8 @@ class PoultryHeaterMLPipeline:
     def __init__(self, data_path):
         self.data_path = data_path
         self.df = None
+        self.heater_counts = None
+        self.corr_matrix = None
         self.X_train = None
         self.X_test = None
         self.y_train = None
@@ -48,14 +96,21 @@ class PoultryHeaterMLPipeline:
         self.results = {}
         self.best_model = None
         self.best_model_name = None
+        self.c_model_bytes = None  # flash used by heater_model.c's arrays, once exported
         
-    def load_data(self):
-        """Load and display basic information about the dataset"""
+    def load_data(self, verbose=False):
+        """Load and display basic information about the dataset
+        
+        verbose adds df.info() and df.describe(), which scan every column.
+        """
         print("=" * 80)
         print("📊 LOADING DATA")
         print("=" * 80)
         
-        self.df = pd.read_csv(self.data_path)
+        self.df = pd.read_csv(self.data_path, engine=CSV_ENGINE, dtype=CSV_DTYPES)
+        # Class counts are needed by exploration, plots and the summary report;
+        # count once here instead of re-running value_counts() in each
+        self.heater_counts = self.df['Heater'].value_counts()
         print(f"\n✓ Dataset loaded successfully!")
         print(f"  Shape: {self.df.shape}")
         print(f"  Rows: {self.df.shape[0]:,}")
@@ -64,11 +119,12 @@ class PoultryHeaterMLPipeline:
         print("\n📋 First few rows:")
         print(self.df.head(10))
         
-        print("\n📊 Dataset Info:")
-        print(self.df.info())
-        
-        print("\n📈 Statistical Summary:")
-        print(self.df.describe())
+        if verbose:
+            print("\n📊 Dataset Info:")
+            print(self.df.info())
+            
+            print("\n📈 Statistical Summary:")
+            print(self.df.describe())
         
         return self.df
     
@@ -91,7 +147,7 @@ class PoultryHeaterMLPipeline:
         
         # Class distribution
         print("\n🎯 Target Variable Distribution (Heater):")
-        heater_dist = self.df['Heater'].value_counts()
+        heater_dist = self.heater_counts
         print(heater_dist)
         print(f"\nClass Balance:")
         print(f"  OFF (0): {heater_dist[0]:,} ({heater_dist[0]/len(self.df)*100:.2f}%)")
@@ -104,7 +160,7 @@ class PoultryHeaterMLPipeline:
         
         # Correlation analysis
         print("\n🔗 Correlation Matrix:")
-        corr_matrix = self.df.corr()
+        corr_matrix = self.corr_matrix = self.df.corr(numeric_only=True)
         print(corr_matrix)
         
         print("\n🎯 Correlation with Heater:")
@@ -117,6 +173,7 @@ class PoultryHeaterMLPipeline:
     def _create_visualizations(self):
         """Create comprehensive visualizations"""
         print("\n📊 Creating visualizations...")
+        plt.close('all')
         
         # 1. Distribution plots
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
@@ -143,36 +200,56 @@ class PoultryHeaterMLPipeline:
         axes[1, 0].set_ylabel('Frequency')
         axes[1, 0].grid(True, alpha=0.3)
         
-        # Heater state distribution
-        heater_counts = self.df['Heater'].value_counts()
+        # Heater state distribution (counts and correlations come from explore_data)
         colors = ['#95E1D3', '#F38181']
-        axes[1, 1].bar(['OFF (0)', 'ON (1)'], heater_counts.values, color=colors, alpha=0.7, edgecolor='black')
+        axes[1, 1].bar(['OFF (0)', 'ON (1)'], self.heater_counts[[0, 1]].values, color=colors, alpha=0.7, edgecolor='black')
         axes[1, 1].set_title('Heater State Distribution', fontweight='bold')
         axes[1, 1].set_ylabel('Count')
         axes[1, 1].grid(True, alpha=0.3, axis='y')
         
         plt.tight_layout()
-        plt.savefig('visualizations_distributions.png', dpi=300, bbox_inches='tight')
+        plt.savefig('visualizations_distributions.png', dpi=150)
         print("  ✓ Saved: visualizations_distributions.png")
         plt.close()
         
         # 2. Correlation heatmap
         fig, ax = plt.subplots(figsize=(10, 8))
-        sns.heatmap(self.df.corr(), annot=True, cmap='coolwarm', center=0, 
+        sns.heatmap(self.corr_matrix, annot=True, cmap='coolwarm', center=0, 
                     square=True, linewidths=1, cbar_kws={"shrink": 0.8}, ax=ax)
         ax.set_title('Feature Correlation Heatmap', fontsize=16, fontweight='bold', pad=20)
         plt.tight_layout()
-        plt.savefig('visualizations_correlation.png', dpi=300, bbox_inches='tight')
+        plt.savefig('visualizations_correlation.png', dpi=150)
         print("  ✓ Saved: visualizations_correlation.png")
         plt.close()
         
-        # 3. Pairplot by heater state
-        print("  ⏳ Creating pairplot (this may take a moment)...")
-        sample_df = self.df.sample(n=min(5000, len(self.df)), random_state=42)
-        g = sns.pairplot(sample_df, hue='Heater', palette={0: '#95E1D3', 1: '#F38181'}, 
-                        diag_kind='kde', plot_kws={'alpha': 0.6})
-        g.fig.suptitle('Feature Relationships by Heater State', y=1.02, fontsize=16, fontweight='bold')
-        plt.savefig('visualizations_pairplot.png', dpi=300, bbox_inches='tight')
+        # 3. Pairwise feature relationships by heater state
+        # Binned on the full dataset (hexbin/histograms are O(N)) instead of
+        # sns.pairplot's per-pane KDEs over a 5,000-row sample
+        pair_features = ['Temp', 'Humidity', 'LDR']
+        values = {feature: self.df[feature].values for feature in pair_features}
+        heater = self.df['Heater'].values
+        heater_off = heater == 0
+        heater_on = ~heater_off
+        
+        fig, axes = plt.subplots(3, 3, figsize=(15, 15))
+        fig.suptitle('Feature Relationships by Heater State', y=0.92, fontsize=16, fontweight='bold')
+        for row, y_feature in enumerate(pair_features):
+            for col, x_feature in enumerate(pair_features):
+                ax = axes[row, col]
+                x = values[x_feature]
+                if row == col:
+                    ax.hist(x[heater_off], bins=40, color='#95E1D3', alpha=0.6, label='OFF (0)')
+                    ax.hist(x[heater_on], bins=40, color='#F38181', alpha=0.6, label='ON (1)')
+                    ax.legend()
+                else:
+                    hb = ax.hexbin(x, values[y_feature], C=heater, reduce_C_function=np.mean,
+                                   gridsize=40, cmap='coolwarm', vmin=0, vmax=1)
+                if row == 2:
+                    ax.set_xlabel(x_feature)
+                if col == 0:
+                    ax.set_ylabel(y_feature)
+        fig.colorbar(hb, ax=axes, shrink=0.6, label='Fraction of readings with heater ON')
+        plt.savefig('visualizations_pairplot.png', dpi=150)
         print("  ✓ Saved: visualizations_pairplot.png")
         plt.close()
         
@@ -191,7 +268,7 @@ class PoultryHeaterMLPipeline:
             axes[idx].grid(True, alpha=0.3, axis='y')
         
         plt.tight_layout()
-        plt.savefig('visualizations_boxplots.png', dpi=300, bbox_inches='tight')
+        plt.savefig('visualizations_boxplots.png', dpi=150)
         print("  ✓ Saved: visualizations_boxplots.png")
         plt.close()
         
@@ -212,16 +289,25 @@ class PoultryHeaterMLPipeline:
             X, y, test_size=test_size, random_state=random_state, stratify=y
         )
         
+        # Hand sklearn contiguous float32/int8 arrays so fit/predict/CV don't
+        # re-validate and copy the DataFrames to float64 on every call
+        # (columns stay in Temp, Humidity, LDR order)
+        self.X_train = np.ascontiguousarray(self.X_train.values, dtype=np.float32)
+        self.X_test = np.ascontiguousarray(self.X_test.values, dtype=np.float32)
+        self.y_train = self.y_train.values.astype(np.int8)
+        self.y_test = self.y_test.values.astype(np.int8)
+        
         print(f"\n✓ Data split completed:")
         print(f"  Training set: {len(self.X_train):,} samples ({len(self.X_train)/len(X)*100:.1f}%)")
         print(f"  Test set:     {len(self.X_test):,} samples ({len(self.X_test)/len(X)*100:.1f}%)")
         
         print(f"\n✓ Class distribution in training set:")
-        train_dist = self.y_train.value_counts()
+        train_dist = np.bincount(self.y_train, minlength=2)
         print(f"  OFF (0): {train_dist[0]:,} ({train_dist[0]/len(self.y_train)*100:.2f}%)")
         print(f"  ON  (1): {train_dist[1]:,} ({train_dist[1]/len(self.y_train)*100:.2f}%)")
         
-        # Note: We'll apply scaling per model as needed
+        # Fit the scaler once; models that need scaled inputs reuse it
+        self.scaler.fit(self.X_train)
         print("\n✓ Data preparation complete!")
         
     def train_models(self):
@@ -234,8 +320,9 @@ class PoultryHeaterMLPipeline:
         self.models = {
             'Logistic Regression': LogisticRegression(random_state=42, max_iter=1000),
             'Decision Tree': DecisionTreeClassifier(random_state=42, max_depth=10),
-            'Random Forest': RandomForestClassifier(random_state=42, n_estimators=100, max_depth=10),
-            'Gradient Boosting': GradientBoostingClassifier(random_state=42, n_estimators=100, max_depth=5)
+            'Random Forest': RandomForestClassifier(random_state=42, n_estimators=100, max_depth=10, n_jobs=-1),
+            'Gradient Boosting': HistGradientBoostingClassifier(random_state=42, max_iter=100, max_depth=5,
+                                                                early_stopping=True)
         }
         
         # Train and evaluate each model
@@ -246,30 +333,28 @@ class PoultryHeaterMLPipeline:
             
             # Scale data for models that benefit from it
             if name in ['Logistic Regression']:
-                scaler = StandardScaler()
-                X_train_scaled = scaler.fit_transform(self.X_train)
-                X_test_scaled = scaler.transform(self.X_test)
+                X_train_scaled = self.scaler.transform(self.X_train)
+                X_test_scaled = self.scaler.transform(self.X_test)
                 
                 model.fit(X_train_scaled, self.y_train)
-                y_pred = model.predict(X_test_scaled)
                 y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
             else:
                 model.fit(self.X_train, self.y_train)
-                y_pred = model.predict(self.X_test)
                 y_pred_proba = model.predict_proba(self.X_test)[:, 1]
             
+            # Same decision as predict() for binary classifiers, without
+            # evaluating the model over the test set a second time
+            y_pred = (y_pred_proba > 0.5).astype(np.int8)
+            
             # Calculate metrics
-            accuracy = accuracy_score(self.y_test, y_pred)
-            precision = precision_score(self.y_test, y_pred)
-            recall = recall_score(self.y_test, y_pred)
-            f1 = f1_score(self.y_test, y_pred)
+            cm, accuracy, precision, recall, f1 = self._binary_metrics(self.y_test, y_pred)
             roc_auc = roc_auc_score(self.y_test, y_pred_proba)
             
-            # Cross-validation score
+            # Cross-validation score (folds run in parallel across cores)
             if name in ['Logistic Regression']:
-                cv_scores = cross_val_score(model, X_train_scaled, self.y_train, cv=5)
+                cv_scores = cross_val_score(model, X_train_scaled, self.y_train, cv=5, n_jobs=-1)
             else:
-                cv_scores = cross_val_score(model, self.X_train, self.y_train, cv=5)
+                cv_scores = cross_val_score(model, self.X_train, self.y_train, cv=5, n_jobs=-1)
             
             # Store results
             self.results[name] = {
@@ -283,7 +368,7 @@ class PoultryHeaterMLPipeline:
                 'cv_std': cv_scores.std(),
                 'y_pred': y_pred,
                 'y_pred_proba': y_pred_proba,
-                'confusion_matrix': confusion_matrix(self.y_test, y_pred)
+                'confusion_matrix': cm
             }
             
             # Print results
@@ -302,37 +387,57 @@ class PoultryHeaterMLPipeline:
         self._select_best_model()
         self._create_model_comparison_plots()
         
-    def _select_best_model(self):
-        """Select the best performing model"""
+    @staticmethod
+    def _binary_metrics(y_true, y_pred):
+        """Confusion matrix, accuracy, precision, recall and F1 from one counting pass
+        
+        Same values as the sklearn metric functions (0 where they would
+        divide by zero), without each one re-walking the labels.
+        """
+        cm = np.bincount(y_true.astype(np.intp) * 2 + y_pred, minlength=4).reshape(2, 2)
+        (tn, fp), (fn, tp) = cm
+        accuracy = (tp + tn) / cm.sum()
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * tp / (2 * tp + fp + fn) if tp + fp + fn else 0.0
+        return cm, accuracy, precision, recall, f1
+    
+    def _select_best_model(self, verbose=True):
+        """Select the best performing model
+        
+        verbose prints the full comparison table (built as a DataFrame
+        only for display).
+        """
         print("\n" + "=" * 80)
         print("🏆 MODEL COMPARISON")
         print("=" * 80)
         
-        # Create comparison dataframe
-        comparison_df = pd.DataFrame({
-            'Model': list(self.results.keys()),
-            'Accuracy': [r['accuracy'] for r in self.results.values()],
-            'Precision': [r['precision'] for r in self.results.values()],
-            'Recall': [r['recall'] for r in self.results.values()],
-            'F1 Score': [r['f1'] for r in self.results.values()],
-            'ROC AUC': [r['roc_auc'] for r in self.results.values()],
-            'CV Mean': [r['cv_mean'] for r in self.results.values()]
-        })
-        
-        comparison_df = comparison_df.sort_values('F1 Score', ascending=False)
-        print("\n📊 Model Performance Comparison:")
-        print(comparison_df.to_string(index=False))
+        if verbose:
+            comparison_df = pd.DataFrame({
+                'Model': list(self.results.keys()),
+                'Accuracy': [r['accuracy'] for r in self.results.values()],
+                'Precision': [r['precision'] for r in self.results.values()],
+                'Recall': [r['recall'] for r in self.results.values()],
+                'F1 Score': [r['f1'] for r in self.results.values()],
+                'ROC AUC': [r['roc_auc'] for r in self.results.values()],
+                'CV Mean': [r['cv_mean'] for r in self.results.values()]
+            })
+            
+            comparison_df = comparison_df.sort_values('F1 Score', ascending=False)
+            print("\n📊 Model Performance Comparison:")
+            print(comparison_df.to_string(index=False))
         
         # Select best model based on F1 score (balanced metric)
-        self.best_model_name = comparison_df.iloc[0]['Model']
-        self.best_model = self.results[self.best_model_name]['model']
+        self.best_model_name, best = max(self.results.items(), key=lambda item: item[1]['f1'])
+        self.best_model = best['model']
         
         print(f"\n🥇 Best Model: {self.best_model_name}")
-        print(f"   F1 Score: {comparison_df.iloc[0]['F1 Score']:.4f}")
+        print(f"   F1 Score: {best['f1']:.4f}")
         
     def _create_model_comparison_plots(self):
         """Create visualizations comparing model performance"""
         print("\n📊 Creating model comparison visualizations...")
+        plt.close('all')
         
         # 1. Metrics comparison
         metrics = ['Accuracy', 'Precision', 'Recall', 'F1 Score', 'ROC AUC']
@@ -359,7 +464,7 @@ class PoultryHeaterMLPipeline:
         ax.set_ylim([0, 1.1])
         
         plt.tight_layout()
-        plt.savefig('model_comparison.png', dpi=300, bbox_inches='tight')
+        plt.savefig('model_comparison.png', dpi=150)
         print("  ✓ Saved: model_comparison.png")
         plt.close()
         
@@ -379,7 +484,7 @@ class PoultryHeaterMLPipeline:
         ax.grid(True, alpha=0.3)
         
         plt.tight_layout()
-        plt.savefig('roc_curves.png', dpi=300, bbox_inches='tight')
+        plt.savefig('roc_curves.png', dpi=150)
         print("  ✓ Saved: roc_curves.png")
         plt.close()
         
@@ -399,14 +504,19 @@ class PoultryHeaterMLPipeline:
             axes[idx].set_yticklabels(['OFF (0)', 'ON (1)'])
         
         plt.tight_layout()
-        plt.savefig('confusion_matrices.png', dpi=300, bbox_inches='tight')
+        plt.savefig('confusion_matrices.png', dpi=150)
         print("  ✓ Saved: confusion_matrices.png")
         plt.close()
         
         print("\n✓ Model comparison visualizations created!")
     
-    def hyperparameter_tuning(self):
-        """Perform hyperparameter tuning on the best model"""
+    def hyperparameter_tuning(self, search='halving'):
+        """Perform hyperparameter tuning on the best model
+        
+        search: 'halving' (successive halving, drops weak candidates after
+        fits on small data subsets), 'random' (30 sampled candidates) or
+        'grid' (every combination).
+        """
         print("\n" + "=" * 80)
         print("⚙️  HYPERPARAMETER TUNING")
         print("=" * 80)
@@ -416,22 +526,22 @@ class PoultryHeaterMLPipeline:
         # Define parameter grids for different models
         param_grids = {
             'Decision Tree': {
-                'max_depth': [5, 10, 15, 20, None],
+                'max_depth': [5, 10, 15, 20],
                 'min_samples_split': [2, 5, 10],
                 'min_samples_leaf': [1, 2, 4],
                 'criterion': ['gini', 'entropy']
             },
             'Random Forest': {
                 'n_estimators': [50, 100, 200],
-                'max_depth': [10, 15, 20, None],
+                'max_depth': [10, 15, 20],
                 'min_samples_split': [2, 5],
                 'min_samples_leaf': [1, 2]
             },
             'Gradient Boosting': {
-                'n_estimators': [50, 100, 150],
+                'max_iter': [50, 100, 150],
                 'learning_rate': [0.01, 0.1, 0.2],
                 'max_depth': [3, 5, 7],
-                'subsample': [0.8, 1.0]
+                'l2_regularization': [0.0, 0.1]
             },
             'Logistic Regression': {
                 'C': [0.01, 0.1, 1, 10, 100],
@@ -448,15 +558,14 @@ class PoultryHeaterMLPipeline:
         model_classes = {
             'Decision Tree': DecisionTreeClassifier,
             'Random Forest': RandomForestClassifier,
-            'Gradient Boosting': GradientBoostingClassifier,
+            'Gradient Boosting': HistGradientBoostingClassifier,
             'Logistic Regression': LogisticRegression
         }
         
         # Prepare data
         if self.best_model_name == 'Logistic Regression':
-            scaler = StandardScaler()
-            X_train_prepared = scaler.fit_transform(self.X_train)
-            X_test_prepared = scaler.transform(self.X_test)
+            X_train_prepared = self.scaler.transform(self.X_train)
+            X_test_prepared = self.scaler.transform(self.X_test)
         else:
             X_train_prepared = self.X_train
             X_test_prepared = self.X_test
@@ -465,14 +574,17 @@ class PoultryHeaterMLPipeline:
         print(f"\n🔍 Searching through parameter combinations...")
         print(f"   This may take a few minutes...")
         
-        grid_search = GridSearchCV(
-            model_classes[self.best_model_name](random_state=42),
-            param_grids[self.best_model_name],
-            cv=5,
-            scoring='f1',
-            n_jobs=-1,
-            verbose=1
-        )
+        estimator = model_classes[self.best_model_name](random_state=42)
+        param_grid = param_grids[self.best_model_name]
+        if search == 'halving':
+            grid_search = HalvingGridSearchCV(estimator, param_grid, factor=3, cv=5, scoring='f1',
+                                              n_jobs=-1, verbose=1, random_state=42)
+        elif search == 'random':
+            grid_search = RandomizedSearchCV(estimator, param_grid, n_iter=30, cv=5, scoring='f1',
+                                             n_jobs=-1, verbose=1, random_state=42)
+        else:
+            grid_search = GridSearchCV(estimator, param_grid, cv=5, scoring='f1',
+                                       n_jobs=-1, verbose=1)
         
         grid_search.fit(X_train_prepared, self.y_train)
         
@@ -488,11 +600,13 @@ class PoultryHeaterMLPipeline:
         y_pred_tuned = grid_search.predict(X_test_prepared)
         y_pred_proba_tuned = grid_search.predict_proba(X_test_prepared)[:, 1]
         
+        _, accuracy, precision, recall, f1 = self._binary_metrics(self.y_test, y_pred_tuned)
+        
         print(f"\n📊 Tuned Model Performance on Test Set:")
-        print(f"   Accuracy:  {accuracy_score(self.y_test, y_pred_tuned):.4f}")
-        print(f"   Precision: {precision_score(self.y_test, y_pred_tuned):.4f}")
-        print(f"   Recall:    {recall_score(self.y_test, y_pred_tuned):.4f}")
-        print(f"   F1 Score:  {f1_score(self.y_test, y_pred_tuned):.4f}")
+        print(f"   Accuracy:  {accuracy:.4f}")
+        print(f"   Precision: {precision:.4f}")
+        print(f"   Recall:    {recall:.4f}")
+        print(f"   F1 Score:  {f1:.4f}")
         print(f"   ROC AUC:   {roc_auc_score(self.y_test, y_pred_proba_tuned):.4f}")
         
         # Update best model
@@ -524,8 +638,8 @@ class PoultryHeaterMLPipeline:
                     f.write(tree_rules)
                 print("\n  ✓ Saved: decision_tree_rules.txt")
                 
-                # Extract tree structure for C code generation
-                self._export_tree_to_c_code()
+            # Extract tree structure for C code generation
+            self._export_tree_to_c_code()
                 
         # For all models, create a lookup table approach
         print("\n📊 Creating quantized lookup table...")
@@ -534,53 +648,133 @@ class PoultryHeaterMLPipeline:
         print("\n✓ Model quantization complete!")
         
     def _export_tree_to_c_code(self):
-        """Export decision tree to C code for microcontroller"""
+        """Export decision tree(s) to C code for microcontroller
+        
+        Nodes are emitted as flat parallel arrays walked by a short loop rather
+        than nested if/else, so code size stays fixed and traversal is driven
+        by data. A Random Forest gets all its trees in the same arrays, with
+        leaves holding P(ON) so the C code averages them like sklearn does.
+        
+        Thresholds are stored as int16 fixed point: each feature is mapped
+        from its data range onto 0..32767, so the walk only needs integer
+        compares and works on MCUs without an FPU.
+        """
         print("\n🔧 Generating C code for microcontroller...")
         
-        tree = self.best_model.tree_
-        feature_names = ['temp', 'humidity', 'ldr']
+        trees = [est.tree_ for est in getattr(self.best_model, 'estimators_', [self.best_model])]
+        forest = len(trees) > 1
+        
+        # Per-feature fixed-point calibration q = (x - offset) * scale, done in
+        # float32 exactly as the generated q_*() helpers compute it in C
+        columns = ['Temp', 'Humidity', 'LDR']
+        q_offset = self.df[columns].min().to_numpy(np.float32)
+        q_scale = np.float32(32767) / np.maximum(self.df[columns].max().to_numpy(np.float32) - q_offset,
+                                                  np.float32(1))
+        
+        # Concatenate every tree's nodes (already in DFS order), shifting child
+        # indices by the tree's offset; leaves have feature -2 and children -1
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        for tree in trees:
+            offset = len(feature)
+            roots.append(offset)
+            is_leaf = tree.children_left == -1
+            f = np.where(is_leaf, 0, tree.feature)
+            thr_q = np.floor((tree.threshold.astype(np.float32) - q_offset[f]) * q_scale[f])
+            feature += tree.feature.tolist()
+            threshold += np.where(is_leaf, 0, np.clip(thr_q, 0, 32767)).astype(int).tolist()
+            left += np.where(is_leaf, -1, tree.children_left + offset).tolist()
+            right += np.where(is_leaf, -1, tree.children_right + offset).tolist()
+            leaf_counts = tree.value[:, 0]
+            if forest:
+                value += (leaf_counts[:, 1] / leaf_counts.sum(axis=1)).tolist()
+            else:
+                value += leaf_counts.argmax(axis=1).tolist()
         
-        c_code = """/*
+        index_type = 'int16_t' if len(feature) <= 32767 else 'int32_t'
+        value_type = 'float' if forest else 'uint8_t'
+        
+        # Flash taken by the node arrays: int8 feature, int16 threshold, two
+        # child indices and the leaf value per node, plus the tree roots
+        index_size = 2 if index_type == 'int16_t' else 4
+        value_size = 4 if forest else 1
+        self.c_model_bytes = (len(feature) * (1 + 2 + 2 * index_size + value_size)
+                              + len(roots) * index_size)
+        
+        def c_array(values, fmt=str):
+            rows = ["    " + ", ".join(map(fmt, values[i:i + 12]))
+                    for i in range(0, len(values), 12)]
+            return "{\n" + ",\n".join(rows) + "\n}"
+        
+        def c_float(v):
+            # 9 significant digits round-trip a float32 exactly
+            literal = f"{v:.9g}"
+            return literal + ("f" if "." in literal or "e" in literal else ".0f")
+        
+        c_code = f"""/*
  * Auto-generated Decision Tree for Poultry Heater Control
  * Features: Temperature, Humidity, LDR (Light)
  * Output: Heater state (0 = OFF, 1 = ON)
  */
 
 #include <stdint.h>
+#include "heater_model.h"
+
+#define N_NODES {len(feature)}
+#define N_TREES {len(trees)}
+
+// Flattened tree nodes; a negative feature marks a leaf
+// Features: 0 = temp, 1 = humidity, 2 = ldr
+static const int8_t NODE_FEATURE[N_NODES] = {c_array(feature)};
+
+// Thresholds in the same fixed-point units as q_temp/q_humidity/q_ldr
+static const int16_t NODE_THRESHOLD[N_NODES] = {c_array(threshold)};
+
+static const {index_type} NODE_LEFT[N_NODES] = {c_array(left)};
+
+static const {index_type} NODE_RIGHT[N_NODES] = {c_array(right)};
+
+// Leaf output: {"probability of heater ON" if forest else "predicted class"}
+static const {value_type} NODE_VALUE[N_NODES] = {c_array(value, c_float if forest else str)};
+
+// Root node of each tree
+static const {index_type} TREE_ROOT[N_TREES] = {c_array(roots)};
+
+// Walk one tree from its root down to a leaf
+static {value_type} predict_tree(const int16_t *f, {index_type} n) {{
+    while (NODE_FEATURE[n] >= 0) {{
+        n = (f[NODE_FEATURE[n]] <= NODE_THRESHOLD[n]) ? NODE_LEFT[n] : NODE_RIGHT[n];
+    }}
+    return NODE_VALUE[n];
+}}
+
+// Predict heater state from fixed-point readings (mean over trees > 0.5)
+uint8_t predict_heater_state_q(int16_t temp_q, int16_t humidity_q, int16_t ldr_q) {{
+    int16_t f[3] = {{temp_q, humidity_q, ldr_q}};
+    {"float total = 0" if forest else "uint16_t total = 0"};
+    for (uint16_t i = 0; i < N_TREES; i++) {{
+        total += predict_tree(f, TREE_ROOT[i]);
+    }}
+    return total * 2 > N_TREES;
+}}
 
 // Predict heater state based on sensor readings
-uint8_t predict_heater_state(float temp, float humidity, float ldr) {
+uint8_t predict_heater_state(float temp, float humidity, float ldr) {{
+    return predict_heater_state_q(q_temp(temp), q_humidity(humidity), q_ldr(ldr));
+}}
 """
         
-        def recurse(node, depth):
-            indent = "    " * depth
-            if tree.feature[node] != -2:  # Not a leaf
-                feature = feature_names[tree.feature[node]]
-                threshold = tree.threshold[node]
-                
-                code = f"{indent}if ({feature} <= {threshold:.2f}) {{\n"
-                code += recurse(tree.children_left[node], depth + 1)
-                code += f"{indent}}} else {{\n"
-                code += recurse(tree.children_right[node], depth + 1)
-                code += f"{indent}}}\n"
-                return code
-            else:  # Leaf node
-                # Get the class with highest count
-                class_counts = tree.value[node][0]
-                predicted_class = int(np.argmax(class_counts))
-                return f"{indent}return {predicted_class};\n"
-        
-        c_code += recurse(0, 1)
-        c_code += "}\n"
-        
         # Save C code
         with open('heater_model.c', 'w') as f:
             f.write(c_code)
         
-        print("  ✓ Saved: heater_model.c")
+        print(f"  ✓ Saved: heater_model.c ({len(feature):,} nodes, "
+              f"{self.c_model_bytes / 1024:.1f} KB of node arrays)")
+        if self.c_model_bytes > ATMEGA_MODEL_BUDGET:
+            print(f"  ⚠️  Too large for an ATmega328P (budget {ATMEGA_MODEL_BUDGET // 1024} KB), "
+                  f"ESP32 only; use heater_model_lookup.c on the ATmega")
         
         # Also create header file
-        h_code = """/*
+        h_code = f"""/*
  * Header file for Poultry Heater Control Model
  */
 
@@ -589,6 +783,29 @@ uint8_t predict_heater_state(float temp, float humidity, float ldr) {
 
 #include <stdint.h>
 
+// Fixed-point calibration: q = (value - OFFSET) * SCALE, clamped to 0..32767
+#define TEMP_OFFSET {c_float(q_offset[0])}
+#define TEMP_SCALE {c_float(q_scale[0])}
+#define HUMIDITY_OFFSET {c_float(q_offset[1])}
+#define HUMIDITY_SCALE {c_float(q_scale[1])}
+#define LDR_OFFSET {c_float(q_offset[2])}
+#define LDR_SCALE {c_float(q_scale[2])}
+
+static inline int16_t q_feature(float value, float offset, float scale) {{
+    float q = (value - offset) * scale;
+    if (q <= 0) return 0;
+    if (q >= 32767) return 32767;
+    return (int16_t)q;
+}}
+
+static inline int16_t q_temp(float temp) {{ return q_feature(temp, TEMP_OFFSET, TEMP_SCALE); }}
+static inline int16_t q_humidity(float humidity) {{ return q_feature(humidity, HUMIDITY_OFFSET, HUMIDITY_SCALE); }}
+static inline int16_t q_ldr(float ldr) {{ return q_feature(ldr, LDR_OFFSET, LDR_SCALE); }}
+
+// Predict heater state from readings already converted with q_*()
+// (lets callers quantize once at ingestion and skip float math entirely)
+uint8_t predict_heater_state_q(int16_t temp_q, int16_t humidity_q, int16_t ldr_q);
+
 // Predict heater state based on sensor readings
 // Parameters:
 //   temp: Temperature in Celsius
@@ -607,6 +824,24 @@ uint8_t predict_heater_state(float temp, float humidity, float ldr);
         
         print("  ✓ Saved: heater_model.h")
         
+    def _predict_grid(self, temp_values, humidity_values, ldr_values, proba=False):
+        """Predict heater state for every (temp, humidity, ldr) combination
+        
+        Returns the (n, 3) grid in temp-major order and the predictions
+        (P(Heater ON) instead when proba is True).
+        """
+        grid = np.array(np.meshgrid(temp_values, humidity_values, ldr_values,
+                                    indexing='ij')).reshape(3, -1).T
+        features = grid
+        
+        # Scale if needed
+        if self.best_model_name == 'Logistic Regression':
+            features = self.scaler.transform(grid)
+        
+        if proba:
+            return grid, self.best_model.predict_proba(features)[:, 1]
+        return grid, self.best_model.predict(features)
+    
     def _create_quantized_lookup_table(self):
         """Create a quantized lookup table for resource-constrained devices"""
         print("\n📊 Creating quantized lookup table...")
@@ -616,27 +851,12 @@ uint8_t predict_heater_state(float temp, float humidity, float ldr);
         humidity_range = np.arange(70, 99, 2)
         ldr_range = np.arange(0, 101, 5)
         
-        # Create lookup table
-        lookup_table = []
-        
-        for temp in temp_range:
-            for humidity in humidity_range:
-                for ldr in ldr_range:
-                    features = np.array([[temp, humidity, ldr]])
-                    
-                    # Scale if needed
-                    if self.best_model_name == 'Logistic Regression':
-                        scaler = StandardScaler()
-                        scaler.fit(self.X_train)
-                        features = scaler.transform(features)
-                    
-                    prediction = self.best_model.predict(features)[0]
-                    lookup_table.append({
-                        'temp': int(temp),
-                        'humidity': int(humidity),
-                        'ldr': int(ldr),
-                        'heater': int(prediction)
-                    })
+        # Predict the whole grid in one batched call
+        grid, predictions = self._predict_grid(temp_range, humidity_range, ldr_range)
+        lookup_table = [
+            {'temp': int(temp), 'humidity': int(humidity), 'ldr': int(ldr), 'heater': int(prediction)}
+            for (temp, humidity, ldr), prediction in zip(grid.tolist(), predictions.tolist())
+        ]
         
         # Save as JSON
         with open('lookup_table.json', 'w') as f:
@@ -645,16 +865,46 @@ uint8_t predict_heater_state(float temp, float humidity, float ldr);
         print(f"  ✓ Created lookup table with {len(lookup_table)} entries")
         print("  ✓ Saved: lookup_table.json")
         
+        # Same grid as a dense probability array for server-side inference
+        self._create_probability_lut(temp_range, humidity_range, ldr_range)
+        
         # Create a simplified version for embedded systems
         print("\n📦 Creating simplified embedded lookup table...")
         self._create_embedded_lookup_table()
         
+    def _create_probability_lut(self, temp_range, humidity_range, ldr_range):
+        """Save P(Heater ON) over the grid as a dense uint8 array (heater_lut.npy)
+        
+        Cell [t, h, l] holds round(P * 255) for the grid point; the axes (start,
+        step, size per feature) go to heater_lut.json. The MQTT bridge memory-maps
+        the array and reads confidence with one index instead of running the model.
+        """
+        _, probabilities = self._predict_grid(temp_range, humidity_range, ldr_range, proba=True)
+        shape = (len(temp_range), len(humidity_range), len(ldr_range))
+        lut = np.rint(probabilities * 255).astype(np.uint8).reshape(shape)
+        np.save('heater_lut.npy', lut)
+        
+        axes = {
+            name: {'start': float(values[0]), 'step': float(values[1] - values[0]), 'size': len(values)}
+            for name, values in (('temperature', temp_range), ('humidity', humidity_range), ('ldr', ldr_range))
+        }
+        with open('heater_lut.json', 'w') as f:
+            json.dump({'axes': axes, 'scale': 255}, f, indent=2)
+        
+        print(f"  ✓ Saved: heater_lut.npy ({'x'.join(map(str, shape))} uint8) + heater_lut.json")
+        
     def _create_embedded_lookup_table(self):
         """Create a compact lookup table for embedded systems"""
         # Use coarser granularity for embedded systems
         temp_bins = np.arange(18, 38, 2)
         humidity_bins = np.arange(70, 100, 5)
-        ldr_bins = np.arange(0, 101, 10)
+        ldr_bins = np.arange(0, 100, 10)  # quantize_ldr() yields bins 0-9
+        n_temp, n_humidity, n_ldr = len(temp_bins), len(humidity_bins), len(ldr_bins)
+        
+        # Generate lookup table from one batched prediction over all bins and
+        # pack it one bit per cell (temp-major, LSB first) instead of one byte
+        _, predictions = self._predict_grid(temp_bins, humidity_bins, ldr_bins)
+        packed = np.packbits(predictions.reshape(-1).astype(np.uint8), bitorder='little')
         
         c_code = """/*
  * Compact Lookup Table for Embedded Systems
@@ -664,66 +914,48 @@ uint8_t predict_heater_state(float temp, float humidity, float ldr);
 #include <stdint.h>
 
 // Quantize sensor values to bin indices
+// Bin edges are whole numbers, so after the range checks one truncating
+// float->int conversion is enough and the rest is integer math
 static uint8_t quantize_temp(float temp) {
     if (temp < 18) return 0;
     if (temp >= 38) return 9;
-    return (uint8_t)((temp - 18) / 2);
+    return (uint8_t)(((uint8_t)temp - 18) >> 1);
 }
 
 static uint8_t quantize_humidity(float humidity) {
     if (humidity < 70) return 0;
     if (humidity >= 100) return 5;
-    return (uint8_t)((humidity - 70) / 5);
+    return (uint8_t)(((uint8_t)humidity - 70) / 5);
 }
 
 static uint8_t quantize_ldr(float ldr) {
     if (ldr < 0) return 0;
     if (ldr >= 100) return 9;
-    return (uint8_t)(ldr / 10);
+    return (uint8_t)ldr / 10;
 }
 
-// Lookup table: [temp_bin][humidity_bin][ldr_bin]
+"""
+        c_code += f"""// Lookup bitset: {n_temp}x{n_humidity}x{n_ldr} cells packed 8 per byte, LSB first
+// Bit index = (temp_bin * {n_humidity} + humidity_bin) * {n_ldr} + ldr_bin
 // 0 = Heater OFF, 1 = Heater ON
-static const uint8_t LOOKUP_TABLE[10][6][10] = {
+static const uint8_t LOOKUP_BITS[{len(packed)}] = {{
 """
         
-        # Generate lookup table
-        for t_idx, temp in enumerate(temp_bins):
-            c_code += "    {\n"
-            for h_idx, humidity in enumerate(humidity_bins):
-                c_code += "        {"
-                row = []
-                for l_idx, ldr in enumerate(ldr_bins):
-                    features = np.array([[temp, humidity, ldr]])
-                    
-                    if self.best_model_name == 'Logistic Regression':
-                        scaler = StandardScaler()
-                        scaler.fit(self.X_train)
-                        features = scaler.transform(features)
-                    
-                    prediction = self.best_model.predict(features)[0]
-                    row.append(str(int(prediction)))
-                
-                c_code += ", ".join(row)
-                c_code += "}"
-                if h_idx < len(humidity_bins) - 1:
-                    c_code += ","
-                c_code += "\n"
-            c_code += "    }"
-            if t_idx < len(temp_bins) - 1:
-                c_code += ","
-            c_code += "\n"
-        
-        c_code += """};
+        rows = ["    " + ", ".join(f"0x{byte:02X}" for byte in packed[i:i + 12])
+                for i in range(0, len(packed), 12)]
+        c_code += ",\n".join(rows) + "\n"
+        
+        c_code += f"""}};
 
 // Fast prediction using lookup table
-uint8_t predict_heater_fast(float temp, float humidity, float ldr) {
+uint8_t predict_heater_fast(float temp, float humidity, float ldr) {{
     uint8_t t_bin = quantize_temp(temp);
     uint8_t h_bin = quantize_humidity(humidity);
     uint8_t l_bin = quantize_ldr(ldr);
     
-    return LOOKUP_TABLE[t_bin][h_bin][l_bin];
-}
+    uint16_t idx = ((uint16_t)t_bin * {n_humidity} + h_bin) * {n_ldr} + l_bin;
+    return (LOOKUP_BITS[idx >> 3] >> (idx & 7)) & 1;
+}}
 """
         
         with open('heater_model_lookup.c', 'w') as f:
@@ -737,18 +969,23 @@ uint8_t predict_heater_fast(float temp, float humidity, float ldr) {
         print("💾 SAVING MODELS AND ARTIFACTS")
         print("=" * 80)
         
-        # Save best model
-        joblib.dump(self.best_model, 'best_model.pkl')
+        # Save best model with pickle protocol 5 (joblib defaults to
+        # pickle.DEFAULT_PROTOCOL, 4 on Python 3.11); joblib.load reads the
+        # protocol from the file and detects the lz4 framing, so loaders need
+        # no changes
+        joblib.dump(self.best_model, 'best_model.pkl', compress=MODEL_COMPRESSION,
+                    protocol=pickle.HIGHEST_PROTOCOL)
         print(f"\n✓ Saved best model: best_model.pkl")
         print(f"  Model: {self.best_model_name}")
         
         # Save scaler if needed
         if self.best_model_name == 'Logistic Regression':
-            scaler = StandardScaler()
-            scaler.fit(self.X_train)
-            joblib.dump(scaler, 'scaler.pkl')
+            joblib.dump(self.scaler, 'scaler.pkl')
             print(f"✓ Saved scaler: scaler.pkl")
         
+        onnx_exported = self._export_onnx()
+        quantization = self._export_tflite()
+        
         # Save model metadata
         metadata = {
             'model_name': self.best_model_name,
@@ -767,6 +1004,8 @@ uint8_t predict_heater_fast(float temp, float humidity, float ldr) {
                 'test_samples': len(self.X_test)
             }
         }
+        if quantization:
+            metadata['quantization'] = quantization
         
         with open('model_metadata.json', 'w') as f:
             json.dump(metadata, f, indent=2)
@@ -774,10 +1013,200 @@ uint8_t predict_heater_fast(float temp, float humidity, float ldr) {
         print(f"✓ Saved metadata: model_metadata.json")
         
         # Create a summary report
-        self._create_summary_report()
+        self._create_summary_report(quantization, onnx_exported)
+        
+    def _export_onnx(self):
+        """Export the best model to ONNX for server-side inference with ONNX Runtime
+        
+        Takes raw (Temp, Humidity, LDR) float32 rows; the scaler is folded in
+        for Logistic Regression so callers never need scaler.pkl.
+        
+        Returns True if best_model.onnx was written.
+        """
+        if convert_sklearn is None:
+            print("⚠️  skl2onnx not installed, skipping ONNX export")
+            return False
+        
+        model = self.best_model
+        if self.best_model_name == 'Logistic Regression':
+            model = make_pipeline(self.scaler, self.best_model)
+        
+        try:
+            onx = convert_sklearn(
+                model,
+                initial_types=[('input', FloatTensorType([None, 3]))],
+                options={type(self.best_model): {'zipmap': False}},  # plain probability tensor
+                target_opset=17
+            )
+        except Exception as e:
+            # Converter coverage lags sklearn releases; the other artifacts are already saved
+            print(f"⚠️  ONNX export failed for {self.best_model_name}: {str(e).splitlines()[0]}")
+            return False
+        with open('best_model.onnx', 'wb') as f:
+            f.write(onx.SerializeToString())
+        
+        print(f"✓ Saved ONNX model: best_model.onnx")
+        return True
+        
+    def _export_tflite(self, parity_threshold=0.99):
+        """Export quantized TFLite models for the ESP32 nodes
+        
+        TFLite cannot convert sklearn estimators, so a tiny Keras MLP is first
+        distilled from the best model, then post-training quantized twice:
+        
+        - heater_model_int8.tflite: INT8 weights (per-channel where the kernel
+          supports it) and per-tensor INT8 activations, int8 input/output
+        - heater_model_16x8.tflite: INT8 weights with INT16 activations, int16
+          input/output, for when 8-bit activations lose too much resolution
+        
+        Both are checked for top-1 parity with the best model on X_test. The
+        INT8 model is deployed as heater_model.tflite unless its parity is
+        below parity_threshold and the 16x8 model does better, in which case
+        the 16x8 model is promoted.
+        
+        Returns the quantization summary for model_metadata.json, or None if
+        TensorFlow is not installed.
+        """
+        if tf is None:
+            print("⚠️  TensorFlow not installed, skipping TFLite export")
+            return None
+        
+        mlp = self._distill_keras_mlp()
+        
+        features = self.X_test
+        if self.best_model_name == 'Logistic Regression':
+            features = self.scaler.transform(self.X_test)
+        reference = self.best_model.predict(features)
+        
+        variants = {
+            'int8': (tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.int8),
+            '16x8': (tf.lite.OpsSet.EXPERIMENTAL_TFLITE_BUILTINS_ACTIVATIONS_INT16_WEIGHTS_INT8, tf.int16)
+        }
+        models, parity = {}, {}
+        for name, (ops, io_type) in variants.items():
+            converter = tf.lite.TFLiteConverter.from_keras_model(mlp)
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = self._representative_dataset
+            converter.target_spec.supported_ops = [ops]
+            converter.inference_input_type = io_type
+            converter.inference_output_type = io_type
+            models[name] = converter.convert()
+            
+            with open(f'heater_model_{name}.tflite', 'wb') as f:
+                f.write(models[name])
+            
+            parity[name] = float(np.mean((self._tflite_predict_proba(models[name], self.X_test) > 0.5)
+                                         == reference))
+            print(f"✓ Saved TFLite model: heater_model_{name}.tflite "
+                  f"({len(models[name]):,} bytes, parity {parity[name]:.4f})")
+        
+        promote = parity['int8'] < parity_threshold and parity['16x8'] > parity['int8']
+        selected = '16x8' if promote else 'int8'
+        with open('heater_model.tflite', 'wb') as f:
+            f.write(models[selected])
+        
+        if selected == '16x8':
+            print(f"⚠️  INT8 parity {parity['int8']:.4f} < {parity_threshold}, promoting the 16x8 model")
+        print(f"✓ Deployed TFLite model: heater_model.tflite ({selected})")
+        
+        return {
+            'selected': selected,
+            'parity_threshold': parity_threshold,
+            'parity': parity,
+            'size_bytes': {name: len(model) for name, model in models.items()}
+        }
+        
+    def _tflite_predict_proba(self, tflite_model, X):
+        """P(Heater ON) for the rows of X from a quantized TFLite model"""
+        interpreter = tf.lite.Interpreter(model_content=tflite_model)
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        interpreter.resize_tensor_input(input_details['index'], [len(X), 3])
+        interpreter.allocate_tensors()
+        
+        # Quantize the input and dequantize the output with the tensors' scales
+        in_scale, in_zero = input_details['quantization']
+        dtype_info = np.iinfo(input_details['dtype'])
+        quantized = np.clip(np.rint(X / in_scale + in_zero), dtype_info.min, dtype_info.max)
+        interpreter.set_tensor(input_details['index'], quantized.astype(input_details['dtype']))
+        interpreter.invoke()
+        
+        out_scale, out_zero = output_details['quantization']
+        return (interpreter.get_tensor(output_details['index'])[:, 0].astype(np.float32) - out_zero) * out_scale
+    
+    def _distill_keras_mlp(self, epochs=30):
+        """Train a 3-16-16-1 Keras MLP on the best model's P(Heater ON) for X_train
+        
+        Takes raw (Temp, Humidity, LDR); a Normalization layer adapted to the
+        training set stands in for the StandardScaler.
+        """
+        features = self.X_train
+        if self.best_model_name == 'Logistic Regression':
+            features = self.scaler.transform(self.X_train)
+        soft_labels = self.best_model.predict_proba(features)[:, 1].astype(np.float32)
+        
+        tf.keras.utils.set_random_seed(42)
+        normalize = tf.keras.layers.Normalization()
+        normalize.adapt(self.X_train)
+        mlp = tf.keras.Sequential([
+            tf.keras.Input(shape=(3,)),
+            normalize,
+            tf.keras.layers.Dense(16, activation='relu'),
+            tf.keras.layers.Dense(16, activation='relu'),
+            tf.keras.layers.Dense(1, activation='sigmoid')
+        ])
+        mlp.compile(optimizer='adam', loss='binary_crossentropy')
+        mlp.fit(self.X_train, soft_labels, epochs=epochs, batch_size=256, verbose=0)
+        return mlp
+    
+    def _representative_dataset(self, n_samples=500):
+        """Yield calibration rows for TFLite quantization (a fixed sample of X_train)"""
+        rng = np.random.default_rng(42)
+        for i in rng.choice(len(self.X_train), min(n_samples, len(self.X_train)), replace=False):
+            yield [self.X_train[i:i + 1]]
+        
+    def _create_summary_report(self, quantization=None, onnx_exported=False):
+        """Create a comprehensive summary report
+        
+        quantization is _export_tflite's summary; the TFLite models are only
+        listed when it is set, and best_model.onnx when onnx_exported, i.e.
+        when they were actually written.
+        """
+        # Everything the template needs, computed once (class counts come
+        # from load_data, counted here only if they are missing)
+        n_total, n_train, n_test = len(self.df), len(self.X_train), len(self.X_test)
+        heater_counts = self.heater_counts
+        if heater_counts is None:
+            heater_counts = self.df['Heater'].value_counts()
+        n_off, n_on = int(heater_counts.get(0, 0)), int(heater_counts.get(1, 0))
+        best = self.results[self.best_model_name]
+        
+        # The C model only exists for tree models, and only fits an ATmega328P
+        # when its node arrays are within ATMEGA_MODEL_BUDGET
+        c_files = ""
+        if self.c_model_bytes is None:
+            c_recommendation = ("1. Deploy the lookup table (heater_model_lookup.c) on the ESP32/ATmega328P;\n"
+                                "   no C model is generated for this model type")
+        else:
+            c_files = ("  ✓ heater_model.c              - C implementation\n"
+                       "  ✓ heater_model.h              - C header file\n")
+            if self.c_model_bytes <= ATMEGA_MODEL_BUDGET:
+                c_recommendation = "1. Deploy the model using the C implementation for ESP32/ATmega328P"
+            else:
+                c_recommendation = (f"1. Deploy the C implementation on the ESP32 only "
+                                    f"({self.c_model_bytes / 1024:.0f} KB of node arrays);\n"
+                                    f"   use the lookup table on the ATmega328P (32 KB flash)")
+        
+        onnx_file = ""
+        if onnx_exported:
+            onnx_file = "  ✓ best_model.onnx             - ONNX model (server side, ONNX Runtime)\n"
+        tflite_files = ""
+        if quantization:
+            tflite_files = (
+                f"  ✓ heater_model.tflite         - Quantized TFLite model (ESP32, {quantization['selected']})\n"
+                "  ✓ heater_model_int8/_16x8.tflite - INT8 and 16x8 TFLite variants\n"
+            )
         
-    def _create_summary_report(self):
-        """Create a comprehensive summary report"""
         report = f"""
 {'=' * 80}
 SMART POULTRY HEATER CONTROL SYSTEM - ML PIPELINE SUMMARY
@@ -785,16 +1214,16 @@ SMART POULTRY HEATER CONTROL SYSTEM - ML PIPELINE SUMMARY
 
 📊 DATASET INFORMATION
 {'─' * 80}
-Total Samples:     {len(self.df):,}
-Training Samples:  {len(self.X_train):,} ({len(self.X_train)/len(self.df)*100:.1f}%)
-Test Samples:      {len(self.X_test):,} ({len(self.X_test)/len(self.df)*100:.1f}%)
+Total Samples:     {n_total:,}
+Training Samples:  {n_train:,} ({n_train/n_total*100:.1f}%)
+Test Samples:      {n_test:,} ({n_test/n_total*100:.1f}%)
 
-Features:          {', '.join(['Temp', 'Humidity', 'LDR'])}
+Features:          Temp, Humidity, LDR
 Target:            Heater (0=OFF, 1=ON)
 
 Class Distribution:
-  OFF (0): {self.df['Heater'].value_counts()[0]:,} ({self.df['Heater'].value_counts()[0]/len(self.df)*100:.2f}%)
-  ON  (1): {self.df['Heater'].value_counts()[1]:,} ({self.df['Heater'].value_counts()[1]/len(self.df)*100:.2f}%)
+  OFF (0): {n_off:,} ({n_off/n_total*100:.2f}%)
+  ON  (1): {n_on:,} ({n_on/n_total*100:.2f}%)
 
 {'─' * 80}
 🤖 MODEL PERFORMANCE
@@ -802,30 +1231,29 @@ Class Distribution:
 Best Model: {self.best_model_name}
 
 Performance Metrics:
-  Accuracy:  {self.results[self.best_model_name]['accuracy']:.4f}
-  Precision: {self.results[self.best_model_name]['precision']:.4f}
-  Recall:    {self.results[self.best_model_name]['recall']:.4f}
-  F1 Score:  {self.results[self.best_model_name]['f1']:.4f}
-  ROC AUC:   {self.results[self.best_model_name]['roc_auc']:.4f}
+  Accuracy:  {best['accuracy']:.4f}
+  Precision: {best['precision']:.4f}
+  Recall:    {best['recall']:.4f}
+  F1 Score:  {best['f1']:.4f}
+  ROC AUC:   {best['roc_auc']:.4f}
 
 Cross-Validation:
-  Mean Score: {self.results[self.best_model_name]['cv_mean']:.4f}
-  Std Dev:    {self.results[self.best_model_name]['cv_std']:.4f}
+  Mean Score: {best['cv_mean']:.4f}
+  Std Dev:    {best['cv_std']:.4f}
 
 Confusion Matrix:
-{self.results[self.best_model_name]['confusion_matrix']}
+{best['confusion_matrix']}
 
 {'─' * 80}
 📦 DEPLOYMENT ARTIFACTS
 {'─' * 80}
 Generated Files:
   ✓ best_model.pkl              - Trained model (Python)
-  ✓ model_metadata.json         - Model information
-  ✓ heater_model.c              - C implementation
-  ✓ heater_model.h              - C header file
-  ✓ heater_model_lookup.c       - Lookup table implementation
+{onnx_file}  ✓ model_metadata.json         - Model information
+{c_files}  ✓ heater_model_lookup.c       - Lookup table implementation
   ✓ lookup_table.json           - Full lookup table
-  ✓ decision_tree_rules.txt     - Human-readable rules
+  ✓ heater_lut.npy/.json        - Dense P(Heater ON) lookup table (server side)
+{tflite_files}  ✓ decision_tree_rules.txt     - Human-readable rules
 
 Visualizations:
   ✓ visualizations_distributions.png
@@ -839,7 +1267,7 @@ Visualizations:
 {'─' * 80}
 💡 RECOMMENDATIONS
 {'─' * 80}
-1. Deploy the model using the C implementation for ESP32/ATmega328P
+{c_recommendation}
 2. Use the lookup table for fastest inference on resource-constrained devices
 3. Monitor prediction confidence and flag low-confidence cases for human review
 4. Consider retraining if sensor ranges extend beyond current data
@@ -855,15 +1283,28 @@ Visualizations:
         print(report)
 
 
+# Start/finish banners for main(), each built once and written in one call
+BANNER = (
+    "\n\n"
+    + "╔" + "═" * 78 + "╗\n"
+    + "║" + " " * 78 + "║\n"
+    + "║" + "  SMART POULTRY HEATER CONTROL SYSTEM - ML PIPELINE  ".center(78) + "║\n"
+    + "║" + " " * 78 + "║\n"
+    + "╚" + "═" * 78 + "╝\n"
+    + "\n\n"
+)
+COMPLETION_MESSAGE = (
+    "\n" + "=" * 80 + "\n"
+    + "✅ ML PIPELINE COMPLETED SUCCESSFULLY!\n"
+    + "=" * 80 + "\n"
+    + "\n🎉 All models trained, evaluated, and exported for deployment!\n"
+    + "\n📁 Check the generated files for deployment artifacts.\n"
+    + "\n\n"
+)
+
 def main():
     """Main execution function"""
-    print("\n")
-    print("╔" + "═" * 78 + "╗")
-    print("║" + " " * 78 + "║")
-    print("║" + "  SMART POULTRY HEATER CONTROL SYSTEM - ML PIPELINE  ".center(78) + "║")
-    print("║" + " " * 78 + "║")
-    print("╚" + "═" * 78 + "╝")
-    print("\n")
+    sys.stdout.write(BANNER)
     
     # Initialize pipeline
     pipeline = PoultryHeaterMLPipeline('data_for_IoT.csv')
@@ -877,13 +1318,7 @@ def main():
     pipeline.quantize_model()
     pipeline.save_models()
     
-    print("\n" + "=" * 80)
-    print("✅ ML PIPELINE COMPLETED SUCCESSFULLY!")
-    print("=" * 80)
-    print("\n🎉 All models trained, evaluated, and exported for deployment!")
-    print("\n📁 Check the generated files for deployment artifacts.")
-    print("\n")
-
+    sys.stdout.write(COMPLETION_MESSAGE)
 
 if __name__ == "__main__":
     main()
@@ -2,82 +2,306 @@
 """
 MQTT Diagnostic Tool
 Checks what's actually being published to the broker
+Requires paho-mqtt>=1.5
 """
 
 import paho.mqtt.client as mqtt
+import argparse
+import asyncio
+import collections
+import itertools
 import json
-from datetime import datetime
+import socket
 import sys
+import threading
+import time
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    _loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
 
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
+MAX_INFLIGHT = 1000
+RECV_BUFFER_SIZE = 1 << 20  # 1 MB socket receive buffer for burst absorption
+DISPLAY_BACKLOG = 1000  # Messages waiting to be printed before new ones are dropped
+
+# Separator bar, built once
+_BAR80 = "=" * 80
+
+# Project topics get the full JSON decode; anything else is shown raw
+JSON_TOPICS = ["poultry/#"]
+
+# Per-field breakdown is only printed with -v/--verbose
+VERBOSE = False
+
+# Only every SAMPLE-th message is printed (--sample N) so a busy broker isn't
+# throttled by terminal output; while sampling, every message is still
+# counted per topic and the counts are reported once per RATE_INTERVAL
+# seconds. paho's thread counts and the asyncio loop swaps the counter out,
+# both under _topic_counts_lock.
+SAMPLE = 1
+RATE_INTERVAL = 1.0
+_msg_counter = itertools.count()
+_topic_counts = collections.Counter()
+_topic_counts_lock = threading.Lock()
+
+# Names for the types a JSON decode can produce
+_TYPE_NAME = {
+    int: 'int', float: 'float', str: 'str', bool: 'bool',
+    list: 'list', dict: 'dict', type(None): 'NoneType'
+}
+
+# Output is assembled as bytes in one reused buffer and written to the
+# binary stdout, so topics/payloads are copied through without decoding.
+# Bound once so the per-message path skips the attribute lookups.
+_buf = bytearray()
+_write = sys.stdout.buffer.write
+_flush = sys.stdout.buffer.flush
+_isatty = sys.stdout.isatty()
+_BAR = _BAR80.encode()
+_TIME_LABEL = "\n⏰ ".encode()
+_TOPIC_LABEL = "\n📍 Topic: ".encode()
+_PAYLOAD_LABEL = "\n📦 Payload: ".encode()
+
+# Formatted wall-clock second, refreshed only when the second rolls over
+_last_sec = [0, ""]
+
+def _timestamp():
+    """Millisecond timestamp, only calling strftime when the second changes"""
+    t = time.time()
+    sec = int(t)
+    if sec != _last_sec[0]:
+        _last_sec[:] = [sec, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))]
+    return f"{_last_sec[1]}.{int((t - sec) * 1000):03d}"
+
+def _raw_topic(msg):
+    """Topic bytes as received (msg.topic re-runs a UTF-8 decode on every access)"""
+    raw = getattr(msg, '_topic', None)
+    return raw if raw is not None else msg.topic.encode()
+
+def _tune_socket(client):
+    """Disable Nagle and enlarge the receive buffer on the broker socket"""
+    sock = client.socket()
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)
 
 def on_connect(client, userdata, flags, rc):
     """Callback when connected to MQTT broker"""
     if rc == 0:
+        _tune_socket(client)
         print("✅ Connected to MQTT Broker")
-        print("📡 Subscribing to ALL topics (#)")
-        client.subscribe("#")  # Subscribe to EVERYTHING
+        if flags.get('session present'):
+            # Persistent session: the broker kept our subscription
+            print("📡 Resumed session, still subscribed to ALL topics (#)")
+        else:
+            print("📡 Subscribing to ALL topics (#)")
+            client.subscribe([("#", 0)])  # Subscribe to EVERYTHING (QoS 0)
+        sys.stdout.flush()  # messages bypass the text layer via stdout.buffer
     else:
         print(f"❌ Connection failed with code {rc}")
-        sys.exit(1)
+        # Let main() disconnect cleanly instead of exiting from paho's thread
+        _connect_failed.set()
+        userdata.call_soon_threadsafe(_stop_event.set)
+
+def _sampled(msg):
+    """True if the message is one of the sampled ones to display (counted per topic when sampling)"""
+    if SAMPLE == 1:
+        return True
+    topic = _raw_topic(msg)
+    with _topic_counts_lock:
+        _topic_counts[topic] += 1
+    return next(_msg_counter) % SAMPLE == 0
+
+# Messages handed to the asyncio loop but not yet printed are capped at
+# DISPLAY_BACKLOG: the network thread no longer waits on the terminal, so
+# without a limit a slow terminal would grow the loop's queue without bound.
+# Messages over the cap are dropped and counted (only on paho's thread).
+_display_slots = threading.Semaphore(DISPLAY_BACKLOG)
+_dropped = 0
+_dropped_reported = 0
+
+def _hand_off(loop, display, msg):
+    """Queue display(msg) on the asyncio loop, or drop it if the backlog is full"""
+    global _dropped
+    if _display_slots.acquire(blocking=False):
+        loop.call_soon_threadsafe(_display_next, display, msg)
+    else:
+        _dropped += 1
+
+def _display_next(display, msg):
+    """Free the message's backlog slot, report any drops, then print it"""
+    global _dropped_reported
+    _display_slots.release()
+    dropped = _dropped
+    if dropped != _dropped_reported:
+        _write(f"⚠️  {dropped - _dropped_reported} messages dropped, "
+               f"output can't keep up ({dropped} total)\n".encode())
+        _dropped_reported = dropped
+    display(msg)
+
+def on_json_message(client, userdata, msg):
+    """Callback for project topics (registered per filter in JSON_TOPICS)"""
+    # Hand formatting/printing to the asyncio loop (passed as userdata) so
+    # paho's network thread can go straight back to reading the socket
+    if _sampled(msg):
+        _hand_off(userdata, display_message, msg)
 
 def on_message(client, userdata, msg):
-    """Callback when message is received"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    topic = msg.topic
-    payload = msg.payload.decode('utf-8')
+    """Callback for topics not matched by JSON_TOPICS"""
+    if _sampled(msg):
+        _hand_off(userdata, display_raw_message, msg)
+
+def _report_rates(loop):
+    """Print per-topic message counts for the last interval, then reschedule"""
+    global _topic_counts
+    with _topic_counts_lock:
+        counts, _topic_counts = _topic_counts, collections.Counter()
+    if counts:
+        rates = ", ".join(f"{topic.decode('ascii', errors='replace')}={n}"
+                          for topic, n in counts.most_common())
+        _write(f"📈 Messages in last {RATE_INTERVAL:g}s: {rates}\n".encode())
+        if _isatty:
+            _flush()
+    loop.call_later(RATE_INTERVAL, _report_rates, loop)
+
+def _begin_message(msg):
+    """Reset the output buffer and add the header shared by both displays"""
+    buf = _buf
+    buf.clear()
+    buf += b"\n"
+    buf += _BAR
+    buf += _TIME_LABEL
+    buf += _timestamp().encode()
+    buf += _TOPIC_LABEL
+    buf += _raw_topic(msg)
+
+def _end_message():
+    """Close the block and emit the buffer with a single write"""
+    buf = _buf
+    buf += _BAR
+    buf += b"\n"
+    _write(buf)
+    if _isatty:
+        _flush()
+
+def display_raw_message(msg):
+    """Print a non-project message without attempting to parse it"""
+    buf = _buf
+    _begin_message(msg)
+    buf += f"\n📦 Payload ({len(msg.payload)} bytes): ".encode()
+    buf += msg.payload
+    buf += b"\n"
+    _end_message()
+
+def display_message(msg):
+    """Format and print a received message (runs on the asyncio loop)"""
+    buf = _buf
+    _begin_message(msg)
+    buf += _PAYLOAD_LABEL
+    buf += msg.payload
+    buf += b"\n"
     
-    print("\n" + "="*80)
-    print(f"⏰ {timestamp}")
-    print(f"📍 Topic: {topic}")
-    print(f"📦 Payload: {payload}")
+    # Only JSON objects are broken out per field, so don't run the parser
+    # on payloads that can't be one (plain numbers, status strings, ...)
+    data = None
+    if msg.payload.lstrip()[:1] == b'{':
+        try:
+            data = _loads(msg.payload)
+        except JSONDecodeError:
+            pass
     
-    # Try to parse as JSON
-    try:
-        data = json.loads(payload)
-        print(f"✅ Valid JSON")
-        print(f"📊 Parsed Data:")
-        for key, value in data.items():
-            print(f"   - {key}: {value} (type: {type(value).__name__})")
+    out = []
+    if data is not None:
+        out.append("✅ Valid JSON\n")
+        if VERBOSE:
+            out.append("📊 Parsed Data:\n")
+            for key, value in data.items():
+                value_type = type(value)
+                type_name = _TYPE_NAME.get(value_type) or value_type.__name__
+                out.append(f"   - {key}: {value} (type: {type_name})\n")
         
         # Check for device0 issue
         if "device_id" in data:
             device_id = data["device_id"]
             if device_id == 0:
-                print(f"⚠️  WARNING: device_id is 0!")
+                out.append("⚠️  WARNING: device_id is 0!\n")
             elif device_id in [1, 2, 3]:
-                print(f"✅ Valid device_id: {device_id}")
+                out.append(f"✅ Valid device_id: {device_id}\n")
             else:
-                print(f"❌ Invalid device_id: {device_id}")
-                
-    except json.JSONDecodeError:
-        print(f"⚠️  Not valid JSON")
+                out.append(f"❌ Invalid device_id: {device_id}\n")
+    else:
+        out.append("⚠️  Not a valid JSON object\n")
     
-    print("="*80)
+    buf += ''.join(out).encode()
+    _end_message()
+
+# Set by on_connect (paho thread) when the broker refuses the connection
+_connect_failed = threading.Event()
+_stop_event = None
+
+async def run_client(client):
+    """Run paho's network thread alongside the asyncio loop until stopped
+    
+    Returns False if the broker refused the connection.
+    """
+    global _stop_event
+    _stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    client.user_data_set(loop)
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+    if SAMPLE > 1:
+        loop.call_later(RATE_INTERVAL, _report_rates, loop)
+    try:
+        await _stop_event.wait()
+    finally:
+        client.loop_stop()
+    return not _connect_failed.is_set()
 
 def main():
     """Main function"""
-    print("\n" + "="*80)
+    global VERBOSE, SAMPLE
+    
+    parser = argparse.ArgumentParser(description="MQTT Diagnostic Tool")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="print every parsed JSON field with its type")
+    parser.add_argument('--sample', type=int, default=1, metavar='N',
+                        help="print only every Nth message and report per-topic rates")
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+    SAMPLE = max(1, args.sample)
+    
+    print("\n" + _BAR80)
     print("🔍 MQTT DIAGNOSTIC TOOL")
-    print("="*80)
+    print(_BAR80)
     print("This tool will show ALL messages on the MQTT broker")
     print("Press Ctrl+C to stop\n")
     
     # Create MQTT client
-    client = mqtt.Client(client_id="mqtt_diagnostic", clean_session=True)
+    client = mqtt.Client(client_id="mqtt_diagnostic", clean_session=False)
+    
+    # Deeper pipelining so bursts don't stall on paho's default limits
+    client.max_inflight_messages_set(MAX_INFLIGHT)
+    client.max_queued_messages_set(0)  # 0 = unlimited
     
     # Set callbacks
     client.on_connect = on_connect
     client.on_message = on_message
+    for topic in JSON_TOPICS:
+        client.message_callback_add(topic, on_json_message)
     
     try:
         # Connect to broker
         print(f"🔌 Connecting to {MQTT_BROKER}:{MQTT_PORT}...")
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        
-        # Start loop
-        client.loop_forever()
+        if not asyncio.run(run_client(client)):
+            client.disconnect()
+            sys.exit(1)
         
     except KeyboardInterrupt:
         print("\n\n⏹️  Stopping diagnostic tool...")
@@ -2,23 +2,47 @@
 """
 MQTT Topic Monitor - Real-time Data Viewer
 Subscribes to all poultry topics and displays incoming data
+Requires paho-mqtt>=1.5
 """
 
 import paho.mqtt.client as mqtt
+import asyncio
 import json
-from datetime import datetime
+import socket
 import sys
+import threading
+import time
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    _loads = json.loads
+    JSONDecodeError = json.JSONDecodeError
+
+# Output is assembled as bytes in one reused buffer and written to the
+# binary stdout, so topics/payloads are copied through without decoding.
+# Bound once so the per-message path skips the attribute lookups.
+_buf = bytearray()
+_write = sys.stdout.buffer.write
+_flush = sys.stdout.buffer.flush
+_isatty = sys.stdout.isatty()
 
 # MQTT Configuration (matches your config.py)
 MQTT_BROKER = "localhost"  # Change to your broker IP if different
 MQTT_PORT = 1883
+MAX_INFLIGHT = 1000
+RECV_BUFFER_SIZE = 1 << 20  # 1 MB socket receive buffer for burst absorption
+DISPLAY_BACKLOG = 1000  # Messages waiting to be printed before new ones are dropped
 MQTT_TOPICS = [
-    "poultry/device1/sensors",
-    "poultry/device2/sensors",
-    "poultry/device3/sensors",
-    "poultry/#"  # Subscribe to all poultry topics
+    "poultry/#"  # Covers every poultry topic, including poultry/deviceN/sensors
 ]
 
+# Separator bars, built once
+_BAR60 = '=' * 60
+_RULE60 = '─' * 60
+
 # Colors for terminal output
 class Colors:
     HEADER = '\033[95m'
@@ -30,62 +54,183 @@ class Colors:
     END = '\033[0m'
     BOLD = '\033[1m'
 
+# Composite prefixes for on_message, built once instead of per message
+_BOLD = Colors.BOLD
+_END = Colors.END
+_MSG_HEADER = (f"{Colors.CYAN}{_BAR60}{Colors.END}\n"
+               f"{Colors.BOLD}📨 Message Received{Colors.END}\n").encode()
+_TIME_LABEL = f"{Colors.YELLOW}Time:{Colors.END} ".encode()
+_TOPIC_LABEL = f"\n{Colors.YELLOW}Topic:{Colors.END} ".encode()
+_RULE = f"\n{Colors.YELLOW}{_RULE60}{Colors.END}\n".encode()
+_JSON_LABEL = f"{Colors.GREEN}JSON Data:{Colors.END}\n".encode()
+_RAW_LABEL = f"{Colors.YELLOW}Raw Data:{Colors.END} ".encode()
+_HEATER_ON = f"{Colors.RED}{Colors.BOLD}ON{Colors.END}\n"
+_HEATER_OFF = f"{Colors.BLUE}{Colors.BOLD}OFF{Colors.END}\n"
+_MSG_FOOTER = f"{Colors.CYAN}{_BAR60}{Colors.END}\n\n".encode()
+
+# Per-field formatters for known sensor keys
+def _fmt_device(key, value):
+    return f"  🔢 {key}: {_BOLD}{value}{_END}\n"
+
+def _fmt_temp(key, value):
+    return f"  🌡️  {key}: {_BOLD}{value}°C{_END}\n"
+
+def _fmt_humidity(key, value):
+    return f"  💧 {key}: {_BOLD}{value}%{_END}\n"
+
+def _fmt_ldr(key, value):
+    return f"  💡 {key}: {_BOLD}{value}%{_END}\n"
+
+def _fmt_heater(key, value):
+    return f"  🔥 {key}: {_HEATER_ON if value == 1 else _HEATER_OFF}"
+
+def _fmt_default(key, value):
+    return f"  📊 {key}: {value}\n"
+
+FORMATTERS = {
+    "device_id": _fmt_device,
+    "temperature": _fmt_temp,
+    "humidity": _fmt_humidity,
+    "ldr": _fmt_ldr,
+    "heater": _fmt_heater,
+}
+
+# Single-reading topics (poultry/nodeN/<reading>) carry a bare value; route
+# them on the last topic level with one dict probe rather than a chain of
+# prefix checks, so adding topics doesn't slow down matching
+LEAF_FORMATTERS = {
+    b"temperature": _fmt_temp,
+    b"humidity": _fmt_humidity,
+    b"light": _fmt_ldr,
+}
+
+# Formatted wall-clock second, refreshed only when the second rolls over
+_last_sec = [0, ""]
+
+def _timestamp():
+    """Current time as HH:MM:SS, formatted at most once per second"""
+    sec = int(time.time())
+    if sec != _last_sec[0]:
+        _last_sec[:] = [sec, time.strftime("%H:%M:%S", time.localtime(sec))]
+    return _last_sec[1]
+
+def _raw_topic(msg):
+    """Topic bytes as received (msg.topic re-runs a UTF-8 decode on every access)"""
+    raw = getattr(msg, '_topic', None)
+    return raw if raw is not None else msg.topic.encode()
+
+def _tune_socket(client):
+    """Disable Nagle and enlarge the receive buffer on the broker socket"""
+    sock = client.socket()
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)
+
 def on_connect(client, userdata, flags, rc):
     """Callback when connected to MQTT broker"""
     if rc == 0:
+        _tune_socket(client)
         print(f"\n{Colors.GREEN}✅ Connected to MQTT Broker!{Colors.END}")
         print(f"{Colors.CYAN}Broker: {MQTT_BROKER}:{MQTT_PORT}{Colors.END}\n")
-        print(f"{Colors.YELLOW}{'='*60}{Colors.END}")
-        print(f"{Colors.BOLD}Subscribing to topics:{Colors.END}")
+        print(f"{Colors.YELLOW}{_BAR60}{Colors.END}")
         
-        # Subscribe to all topics
+        if flags.get('session present'):
+            # Persistent session: the broker kept our subscriptions
+            print(f"{Colors.BOLD}Resumed session, still subscribed to:{Colors.END}")
+        else:
+            print(f"{Colors.BOLD}Subscribing to topics:{Colors.END}")
+            # Subscribe to all topics in one SUBSCRIBE packet (QoS 0)
+            client.subscribe([(topic, 0) for topic in MQTT_TOPICS])
         for topic in MQTT_TOPICS:
-            client.subscribe(topic)
             print(f"  📡 {topic}")
         
-        print(f"{Colors.YELLOW}{'='*60}{Colors.END}\n")
+        print(f"{Colors.YELLOW}{_BAR60}{Colors.END}\n")
         print(f"{Colors.GREEN}🎧 Listening for messages... (Press Ctrl+C to stop){Colors.END}\n")
+        sys.stdout.flush()  # messages bypass the text layer via stdout.buffer
     else:
         print(f"{Colors.RED}❌ Connection failed with code {rc}{Colors.END}")
-        sys.exit(1)
+        # Let main() disconnect cleanly instead of exiting from paho's thread
+        _connect_failed.set()
+        userdata.call_soon_threadsafe(_stop_event.set)
+
+# Messages handed to the asyncio loop but not yet printed are capped at
+# DISPLAY_BACKLOG: the network thread no longer waits on the terminal, so
+# without a limit a slow terminal would grow the loop's queue without bound.
+# Messages over the cap are dropped and counted (only on paho's thread).
+_display_slots = threading.Semaphore(DISPLAY_BACKLOG)
+_dropped = 0
+_dropped_reported = 0
 
 def on_message(client, userdata, msg):
     """Callback when message is received"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    topic = msg.topic
-    payload = msg.payload.decode('utf-8')
+    global _dropped
+    # Hand formatting/printing to the asyncio loop (passed as userdata) so
+    # paho's network thread can go straight back to reading the socket
+    if _display_slots.acquire(blocking=False):
+        userdata.call_soon_threadsafe(_display_next, msg)
+    else:
+        _dropped += 1
+
+def _display_next(msg):
+    """Free the message's backlog slot, report any drops, then print it"""
+    global _dropped_reported
+    _display_slots.release()
+    dropped = _dropped
+    if dropped != _dropped_reported:
+        _write(f"{Colors.RED}⚠️  {dropped - _dropped_reported} messages dropped, "
+               f"output can't keep up ({dropped} total){Colors.END}\n".encode())
+        _dropped_reported = dropped
+    display_message(msg)
+
+def display_message(msg, get_formatter=FORMATTERS.get, intern=sys.intern):
+    """Format and print a received message (runs on the asyncio loop)
     
-    # Print header
-    print(f"{Colors.CYAN}{'='*60}{Colors.END}")
-    print(f"{Colors.BOLD}📨 Message Received{Colors.END}")
-    print(f"{Colors.YELLOW}Time:{Colors.END} {timestamp}")
-    print(f"{Colors.YELLOW}Topic:{Colors.END} {topic}")
-    print(f"{Colors.YELLOW}{'─'*60}{Colors.END}")
+    get_formatter and intern are bound at definition time so the per-field
+    loop does fast local lookups instead of global + attribute lookups.
+    Parsed JSON keys are interned so FORMATTERS matches them by identity.
+    """
+    raw_topic = _raw_topic(msg)
+    payload = msg.payload
     
-    # Try to parse as JSON
-    try:
-        data = json.loads(payload)
-        print(f"{Colors.GREEN}JSON Data:{Colors.END}")
-        for key, value in data.items():
-            if key == "device_id":
-                print(f"  🔢 {key}: {Colors.BOLD}{value}{Colors.END}")
-            elif key == "temperature":
-                print(f"  🌡️  {key}: {Colors.BOLD}{value}°C{Colors.END}")
-            elif key == "humidity":
-                print(f"  💧 {key}: {Colors.BOLD}{value}%{Colors.END}")
-            elif key == "ldr":
-                print(f"  💡 {key}: {Colors.BOLD}{value}%{Colors.END}")
-            elif key == "heater":
-                status = "ON" if value == 1 else "OFF"
-                color = Colors.RED if value == 1 else Colors.BLUE
-                print(f"  🔥 {key}: {color}{Colors.BOLD}{status}{Colors.END}")
-            else:
-                print(f"  📊 {key}: {value}")
-    except json.JSONDecodeError:
-        # Not JSON, print raw payload
-        print(f"{Colors.YELLOW}Raw Data:{Colors.END} {payload}")
+    # Build the whole block in the shared buffer and emit it with one write
+    buf = _buf
+    buf.clear()
+    buf += _MSG_HEADER
+    buf += _TIME_LABEL
+    buf += _timestamp().encode()
+    buf += _TOPIC_LABEL
+    buf += raw_topic
+    buf += _RULE
     
-    print(f"{Colors.CYAN}{'='*60}{Colors.END}\n")
+    # Only JSON objects are broken out per field, so don't run the parser
+    # on payloads that can't be one (plain numbers, status strings, ...)
+    data = None
+    if payload.lstrip()[:1] == b'{':
+        try:
+            data = _loads(payload)
+        except JSONDecodeError:
+            pass
+    
+    if data is not None:
+        buf += _JSON_LABEL
+        buf += ''.join([get_formatter(intern(key), _fmt_default)(key, value)
+                        for key, value in data.items()]).encode()
+    else:
+        leaf = raw_topic.rpartition(b'/')[2]
+        fmt = LEAF_FORMATTERS.get(leaf)
+        if fmt is not None:
+            value = payload.decode('utf-8', errors='replace').strip()
+            buf += fmt(leaf.decode('ascii'), value).encode()
+        else:
+            # Not JSON, copy the raw payload through as-is
+            buf += _RAW_LABEL
+            buf += payload
+            buf += b"\n"
+    
+    buf += _MSG_FOOTER
+    _write(buf)
+    if _isatty:
+        _flush()
 
 def on_disconnect(client, userdata, rc):
     """Callback when disconnected"""
@@ -94,14 +239,38 @@ def on_disconnect(client, userdata, rc):
     else:
         print(f"\n{Colors.YELLOW}🔌 Disconnected from MQTT broker{Colors.END}")
 
+# Set by on_connect (paho thread) when the broker refuses the connection
+_connect_failed = threading.Event()
+_stop_event = None
+
+async def run_client(client):
+    """Run paho's network thread alongside the asyncio loop until stopped
+    
+    Returns False if the broker refused the connection.
+    """
+    global _stop_event
+    _stop_event = asyncio.Event()
+    client.user_data_set(asyncio.get_running_loop())
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+    try:
+        await _stop_event.wait()
+    finally:
+        client.loop_stop()
+    return not _connect_failed.is_set()
+
 def main():
     """Main function"""
-    print(f"\n{Colors.HEADER}{'='*60}{Colors.END}")
+    print(f"\n{Colors.HEADER}{_BAR60}{Colors.END}")
     print(f"{Colors.HEADER}{Colors.BOLD}🐔 Smart Poultry MQTT Monitor{Colors.END}")
-    print(f"{Colors.HEADER}{'='*60}{Colors.END}")
+    print(f"{Colors.HEADER}{_BAR60}{Colors.END}")
     
     # Create MQTT client
-    client = mqtt.Client(client_id="mqtt_monitor", clean_session=True)
+    client = mqtt.Client(client_id="mqtt_monitor", clean_session=False)
+    
+    # Deeper pipelining so bursts don't stall on paho's default limits
+    client.max_inflight_messages_set(MAX_INFLIGHT)
+    client.max_queued_messages_set(0)  # 0 = unlimited
     
     # Set callbacks
     client.on_connect = on_connect
@@ -111,10 +280,9 @@ def main():
     try:
         # Connect to broker
         print(f"\n{Colors.CYAN}🔌 Connecting to {MQTT_BROKER}:{MQTT_PORT}...{Colors.END}")
-        client.connect(MQTT_BROKER, MQTT_PORT, 60)
-        
-        # Start loop
-        client.loop_forever()
+        if not asyncio.run(run_client(client)):
+            client.disconnect()
+            sys.exit(1)
         
     except KeyboardInterrupt:
         print(f"\n\n{Colors.YELLOW}⏹️  Stopping monitor...{Colors.END}")
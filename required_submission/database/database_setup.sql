@@ -94,7 +94,27 @@ CREATE TABLE IF NOT EXISTS system_logs (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================
--- 5. VIEWS FOR EASY QUERYING
+-- 5. PACKED SENSOR ARCHIVE TABLE
+-- ============================================
+
+-- One row per device per minute holding all of that minute's readings,
+-- written by the MQTT bridge for long-term storage and analytics.
+-- readings = compressed little-endian records of int64 ts_ms, float32
+-- temperature, humidity, ldr, uint8 heater_state, float32 confidence (NaN = none)
+CREATE TABLE IF NOT EXISTS sensor_readings_packed (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    device_id INT NOT NULL,
+    minute_ts TIMESTAMP NOT NULL COMMENT 'Start of the minute the readings belong to',
+    reading_count INT UNSIGNED NOT NULL,
+    codec ENUM('zstd', 'zlib') NOT NULL COMMENT 'Compression of the readings blob',
+    readings MEDIUMBLOB NOT NULL COMMENT 'Packed 25-byte reading records',
+    
+    INDEX idx_device_minute (device_id, minute_ts),
+    INDEX idx_minute (minute_ts)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================
+-- 6. VIEWS FOR EASY QUERYING
 -- ============================================
 
 -- Latest reading per device
@@ -136,7 +156,7 @@ WHERE timestamp >= DATE_SUB(NOW(), INTERVAL 24 HOUR)
 GROUP BY device_id;
 
 -- ============================================
--- 6. STORED PROCEDURES
+-- 7. STORED PROCEDURES
 -- ============================================
 
 DELIMITER //
@@ -190,20 +210,20 @@ END //
 DELIMITER ;
 
 -- ============================================
--- 7. INITIAL SYSTEM LOG
+-- 8. INITIAL SYSTEM LOG
 -- ============================================
 
 INSERT INTO system_logs (log_level, message, source) 
 VALUES ('INFO', 'Database initialized successfully', 'database_setup');
 
 -- ============================================
--- 8. DISPLAY SETUP SUMMARY
+-- 9. DISPLAY SETUP SUMMARY
 -- ============================================
 
 SELECT '✅ Database setup complete!' as status;
 SELECT COUNT(*) as device_count FROM devices;
 SELECT 'Tables created:' as info, 
-       'devices, sensor_readings, control_commands, system_logs' as tables;
+       'devices, sensor_readings, control_commands, system_logs, sensor_readings_packed' as tables;
 SELECT 'Views created:' as info,
        'latest_readings, device_stats_24h' as views;
 SELECT 'Procedures created:' as info,
@@ -14,7 +14,7 @@ MYSQL_CONFIG = {
     'port': 3306,
     'charset': 'utf8mb4',
     'autocommit': True,
-    'pool_size': 5,  # Connection pool size
+    'pool_size': 5,  # Connection pool size (raised to message_workers + 2 if smaller)
     'pool_name': 'poultry_pool'
 }
 
@@ -44,6 +44,9 @@ MQTT_CONFIG = {
         ('poultry/node1/light', 1),
         ('poultry/node2/light', 1),
         ('poultry/node3/light', 1),
+        ('poultry/node1/bin', 1),  # Compact binary readings (see BINARY_READING_FORMAT)
+        ('poultry/node2/bin', 1),
+        ('poultry/node3/bin', 1),
         ('poultry/control/#', 1),
         ('poultry/status', 1)
     ],
@@ -115,11 +118,22 @@ LOGGING_CONFIG = {
 SYSTEM_CONFIG = {
     'device_count': 3,
     'device_timeout': 300,  # Seconds before marking device offline
-    'reconnect_delay': 5,  # Seconds between reconnection attempts
+    'reconnect_delay': 5,  # Seconds before the first reconnection attempt (doubles each retry)
+    'max_reconnect_delay': 60,  # Cap on the doubling delay (before the +/-50% jitter)
     'max_reconnect_attempts': 10,
     'data_retention_days': 30,  # Days to keep sensor data
     'enable_database_logging': True,
-    'enable_file_logging': True
+    'enable_file_logging': True,
+    'db_batch_size': 200,  # Buffered rows that trigger an immediate database write
+    'db_flush_interval': 0.5,  # Seconds between writes of buffered rows
+    'db_retry_delay': 5,  # Seconds before retrying a write that failed on the connection
+    'max_buffered_rows': 10000,  # Per table, rows kept for retry while the database is down (oldest dropped)
+    'db_idle_ping': 60,  # Ping a connection idle this many seconds before reusing it
+    'device_seen_interval': 5,  # Seconds between last_seen writes for a device that keeps reporting
+    'enable_packed_archive': True,  # Also archive readings as one compressed row per device per minute
+    'message_workers': 2,  # Threads decoding/storing received MQTT messages
+    'message_queue_size': 10000,  # Received messages held before new ones are dropped
+    'heater_lut_path': 'heater_lut.npy'  # ML pipeline's P(Heater ON) table for missing confidence, relative to this directory (None to disable)
 }
 
 # ============================================
@@ -11,9 +11,75 @@ import json
 import time
 from datetime import datetime
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
+import functools
+import math
+import os
 import sys
 import signal
+import socket
+import threading
+import queue
+import random
+import struct
+import zlib
+
+try:
+    import orjson
+    _loads = orjson.loads
+    JSONDecodeError = orjson.JSONDecodeError
+    
+    def _dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    def _finite(obj):
+        """obj with non-finite floats (NaN, inf) replaced by None, recursively"""
+        if isinstance(obj, float):
+            return obj if math.isfinite(obj) else None
+        if isinstance(obj, dict):
+            return {key: _finite(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [_finite(value) for value in obj]
+        return obj
+    
+    def _dumps(obj):
+        """json.dumps writing non-finite floats as null, as orjson does
+        (json.dumps would write NaN, which MySQL's JSON type rejects)"""
+        try:
+            return json.dumps(obj, allow_nan=False)
+        except ValueError:
+            return json.dumps(_finite(obj), allow_nan=False)
+    try:
+        import simdjson
+        _simdjson_parsers = threading.local()
+        
+        def _loads(payload):
+            """Parse with this thread's reusable simdjson parser
+            
+            recursive=True returns plain dicts/lists: the parser's lazy
+            documents are invalidated by its next parse, and handlers keep
+            and modify what they are given.
+            """
+            parser = getattr(_simdjson_parsers, 'parser', None)
+            if parser is None:
+                parser = _simdjson_parsers.parser = simdjson.Parser()
+            return parser.parse(payload, True)
+        
+        JSONDecodeError = ValueError  # simdjson raises ValueError subclasses
+    except ImportError:  # pysimdjson is optional too, last resort is json
+        _loads = json.loads
+        JSONDecodeError = json.JSONDecodeError
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, archived readings fall back to zlib
+    zstandard = None
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only needed for the heater lookup table
+    np = None
 
 from config import (
     MYSQL_CONFIG, MQTT_CONFIG, VALIDATION_RULES,
@@ -27,6 +93,10 @@ from config import (
 # Database connection pool (global)
 db_connection_pool = None
 
+# Each thread keeps one pooled connection for its lifetime instead of
+# taking and returning one around every statement
+db_thread_local = threading.local()
+
 # MQTT client (global)
 mqtt_client = None
 
@@ -34,17 +104,112 @@ mqtt_client = None
 is_connected = False
 reconnect_count = 0
 
-# Logger (global)
+# Received messages waiting for the worker threads, one queue per worker.
+# paho's network thread only enqueues, so decoding and database writes never
+# hold up socket reads or keepalives.
+message_queues = [
+    queue.Queue(maxsize=max(1, SYSTEM_CONFIG['message_queue_size'] // SYSTEM_CONFIG['message_workers']))
+    for _ in range(SYSTEM_CONFIG['message_workers'])
+]
+worker_threads = []
+bridge_stop = threading.Event()
+
+# Logger (global) and the background thread that writes its records
 logger = None
+log_listener = None
+
+# ML pipeline's P(Heater ON) lookup table (memory-mapped), its axes as
+# (start, step, size) for temperature, humidity and LDR, and the cell value
+# that means P = 1; None until loaded
+heater_lut = None
+heater_lut_axes = None
+heater_lut_scale = None
+
+# Buffered database writes: INSERT statement -> rows waiting to be written.
+# Rows are flushed with one executemany and transaction per table once
+# db_batch_size rows are queued or every db_flush_interval seconds.
+SENSOR_READING_SQL = """
+    INSERT INTO sensor_readings 
+    (device_id, temperature, humidity, ldr, heater_state, prediction_confidence, timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+CONTROL_COMMAND_SQL = """
+    INSERT INTO control_commands 
+    (device_id, command_type, command_value, source, timestamp)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+SYSTEM_LOG_SQL = """
+    INSERT INTO system_logs (log_level, message, source, details, timestamp)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+# Devices that sent readings since the last flush, marked online in one
+# statement per batch (written first so new readings satisfy the foreign key).
+# A device already written is only rewritten every device_seen_interval
+# seconds; last_seen doesn't need batch precision against device_timeout.
+DEVICE_SEEN_SQL = """
+    INSERT INTO devices (device_id, device_name, status, last_seen)
+    VALUES (%s, %s, 'online', %s)
+    ON DUPLICATE KEY UPDATE status = 'online', last_seen = VALUES(last_seen)
+"""
+# Explicit status changes (poultry/status) are written immediately, through
+# a server-side prepared statement
+DEVICE_STATUS_SQL = """
+    UPDATE devices 
+    SET status = %s, last_seen = NOW()
+    WHERE device_id = %s
+"""
+BUFFERED_TABLES = {
+    SENSOR_READING_SQL: 'sensor_readings',
+    CONTROL_COMMAND_SQL: 'control_commands',
+    SYSTEM_LOG_SQL: 'system_logs',
+}
+# A failed write whose cause can pass (server unreachable, connection lost,
+# pool exhausted, lock wait timeout, deadlock) puts its rows back for the
+# next flush, up to max_buffered_rows per table; any other error is down to
+# the rows themselves, so only the rows the server rejects are dropped.
+# Lock errors are matched by errno: the connector raises them as generic
+# DatabaseError/InternalError.
+DB_RETRY_ERRORS = (mysql.connector.InterfaceError, mysql.connector.OperationalError,
+                   mysql.connector.PoolError)
+DB_RETRY_ERRNOS = frozenset((1205, 1213))  # ER_LOCK_WAIT_TIMEOUT, ER_LOCK_DEADLOCK
+write_buffers = {sql: [] for sql in BUFFERED_TABLES}
+devices_seen = {}  # device_id -> time of its latest reading
+devices_written = {}  # device_id -> monotonic time its last_seen was last written
+buffered_row_count = 0
+write_buffer_lock = threading.Lock()
+flush_thread = None
+flush_stop = threading.Event()
+flush_wake = threading.Event()  # set when a batch fills up before the next tick
+
+# Long-term archive: each device's readings for a minute are packed into one
+# compressed row once the minute is over (row count, not bytes, is what
+# costs on insert). A record is little-endian int64 ts_ms, float32
+# temperature, humidity, ldr, uint8 heater_state, float32 confidence (NaN =
+# none), the same layout as a numpy structured array of those fields.
+PACKED_READING_SQL = """
+    INSERT INTO sensor_readings_packed (device_id, minute_ts, reading_count, codec, readings)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+PACKED_READING_FORMAT = struct.Struct('<qfffBf')
+ARCHIVE_CODEC = 'zstd' if zstandard is not None else 'zlib'
+archive_buffers = {}  # (device_id, minute) -> sensor reading rows
 
 # ============================================
 # Logging Functions
 # ============================================
 
 def setup_logging():
-    """Configure logging with file and console handlers"""
+    """Configure logging with file and console handlers
+    
+    The handlers run on a QueueListener thread; the logger itself only has a
+    QueueHandler, so the MQTT and worker threads never wait on file or
+    console writes.
+    """
+    global log_listener
+    
     log = logging.getLogger('MQTTBridge')
     log.setLevel(getattr(logging, LOGGING_CONFIG['log_level']))
+    handlers = []
     
     # File handler with rotation
     file_handler = RotatingFileHandler(
@@ -53,13 +218,19 @@ def setup_logging():
         backupCount=LOGGING_CONFIG['backup_count']
     )
     file_handler.setFormatter(logging.Formatter(LOGGING_CONFIG['log_format']))
-    log.addHandler(file_handler)
+    handlers.append(file_handler)
     
     # Console handler
     if LOGGING_CONFIG['console_output']:
         console_handler = logging.StreamHandler(sys.stdout)
         console_handler.setFormatter(logging.Formatter(LOGGING_CONFIG['log_format']))
-        log.addHandler(console_handler)
+        handlers.append(console_handler)
+    
+    log_queue = queue.Queue(-1)
+    log.addHandler(QueueHandler(log_queue))
+    log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)  # writes out queued records on exit
     
     return log
 
@@ -71,10 +242,22 @@ def initialize_database_pool():
     """Initialize MySQL connection pool"""
     global db_connection_pool
     
+    # Use the connector's C extension where it is installed (the protocol is
+    # then parsed in C); asking for it explicitly without one raises
+    use_pure = not getattr(mysql.connector, 'HAVE_CEXT', False)
+    
+    # Each message worker, the flush thread and the main thread (final flush
+    # on shutdown) keep a connection for their lifetime, so a smaller pool
+    # would run out once they all have written
+    pool_size = max(MYSQL_CONFIG['pool_size'], SYSTEM_CONFIG['message_workers'] + 2)
+    if pool_size != MYSQL_CONFIG['pool_size']:
+        logger.warning("⚠️  pool_size %d is too small for %d message workers, using %d",
+                       MYSQL_CONFIG['pool_size'], SYSTEM_CONFIG['message_workers'], pool_size)
+    
     try:
         db_connection_pool = pooling.MySQLConnectionPool(
             pool_name=MYSQL_CONFIG['pool_name'],
-            pool_size=MYSQL_CONFIG['pool_size'],
+            pool_size=pool_size,
             pool_reset_session=True,
             host=MYSQL_CONFIG['host'],
             user=MYSQL_CONFIG['user'],
@@ -82,50 +265,110 @@ def initialize_database_pool():
             database=MYSQL_CONFIG['database'],
             port=MYSQL_CONFIG['port'],
             charset=MYSQL_CONFIG['charset'],
-            autocommit=MYSQL_CONFIG['autocommit']
+            autocommit=MYSQL_CONFIG['autocommit'],
+            use_pure=use_pure
         )
         logger.info("✅ MySQL connection pool initialized")
+        logger.info("🔌 MySQL protocol: %s", 'pure Python' if use_pure else 'C extension')
         log_system_event('INFO', 'MySQL connection pool initialized')
+        start_flush_thread()
         return True
     except mysql.connector.Error as e:
-        logger.error(f"❌ Failed to initialize MySQL pool: {e}")
+        logger.error("❌ Failed to initialize MySQL pool: %s", e)
         return False
 
 def get_database_connection():
-    """Get connection from pool"""
+    """Get this thread's connection, taking one from the pool on first use
+    
+    A connection idle for more than db_idle_ping seconds is pinged (and
+    reconnected if needed) before reuse, since the server drops idle
+    connections after its wait_timeout.
+    """
     global db_connection_pool
     
+    now = time.monotonic()
+    conn = getattr(db_thread_local, 'conn', None)
+    if conn is not None:
+        if now - db_thread_local.last_used > SYSTEM_CONFIG['db_idle_ping']:
+            try:
+                connection_id = conn.connection_id
+                conn.ping(reconnect=True, attempts=1)
+                if conn.connection_id != connection_id:
+                    db_thread_local.prepared = None  # prepared statements died with the old session
+            except mysql.connector.Error:
+                release_database_connection()
+                conn = None
+        if conn is not None:
+            db_thread_local.last_used = now
+            return conn
+    
     try:
-        return db_connection_pool.get_connection()
+        conn = db_thread_local.conn = db_connection_pool.get_connection()
+        db_thread_local.last_used = now
+        return conn
     except mysql.connector.Error as e:
-        logger.error(f"❌ Failed to get connection from pool: {e}")
+        logger.error("❌ Failed to get connection from pool: %s", e)
         raise
 
+def get_prepared_cursor(sql):
+    """Get this thread's server-side prepared cursor for sql
+    
+    The statement is parsed by the server once per connection and later calls
+    only send parameters. A prepared cursor re-prepares whenever it is given
+    different SQL, so each statement keeps its own cursor.
+    
+    Batched INSERTs don't use this: a plain cursor's executemany already sends
+    them as one multi-row INSERT, where a prepared one would execute per row.
+    """
+    # First, so an idle connection is pinged; if it had to be reconnected or
+    # replaced, the cached cursors were cleared and are rebuilt below
+    conn = get_database_connection()
+    
+    cursors = getattr(db_thread_local, 'prepared', None)
+    if cursors is None:
+        cursors = db_thread_local.prepared = {}
+    
+    cursor = cursors.get(sql)
+    if cursor is None:
+        cursor = cursors[sql] = conn.cursor(prepared=True)
+    return cursor
+
+def get_database_cursor():
+    """Get this thread's plain cursor for batched writes, kept with its connection"""
+    conn = get_database_connection()
+    cursor = getattr(db_thread_local, 'cursor', None)
+    if cursor is None:
+        cursor = db_thread_local.cursor = conn.cursor()
+    return cursor
+
+def release_database_connection():
+    """Return this thread's connection to the pool (after an error or on shutdown)"""
+    conn = getattr(db_thread_local, 'conn', None)
+    db_thread_local.conn = None
+    db_thread_local.cursor = None
+    db_thread_local.prepared = None  # statements die with the connection
+    if conn is not None:
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
 def update_device_status(device_id, status='online'):
     """Update device status and last_seen timestamp"""
     try:
-        conn = get_database_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE devices 
-            SET status = %s, last_seen = NOW()
-            WHERE device_id = %s
-        """, (status, device_id))
+        # The pool is autocommit, so there's no separate COMMIT round trip
+        get_prepared_cursor(DEVICE_STATUS_SQL).execute(DEVICE_STATUS_SQL, (status, device_id))
         
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        logger.debug(f"📱 Device {device_id} status updated: {status}")
+        logger.debug("📱 Device %s status updated: %s", device_id, status)
         return True
     except mysql.connector.Error as e:
-        logger.error(f"❌ Failed to update device status: {e}")
+        logger.error("❌ Failed to update device status: %s", e)
+        release_database_connection()
         return False
 
 def store_sensor_reading(data):
     """
-    Store sensor reading in database
+    Queue sensor reading for the next database write
     
     Expected data format:
     {
@@ -137,104 +380,337 @@ def store_sensor_reading(data):
         "confidence": 0.92  # Optional
     }
     """
+    # Timestamped now, not when the batch is written; the device's online
+    # status / last_seen is updated with the batch
+    row = (
+        data['device_id'],
+        data['temperature'],
+        data['humidity'],
+        data['ldr'],
+        data['heater'],
+        data.get('confidence', None),
+        datetime.now()
+    )
+    buffer_write(SENSOR_READING_SQL, row, device_id=data['device_id'])
+    if SYSTEM_CONFIG['enable_packed_archive']:
+        archive_sensor_reading(row)
+    
+    # %-style, so the message is only formatted if INFO is enabled
+    logger.info(
+        "📊 Sensor data queued - Device %s: Temp=%s°C, Humidity=%s%%, LDR=%s%%, Heater=%s",
+        data['device_id'], data['temperature'], data['humidity'], data['ldr'],
+        'ON' if data['heater'] else 'OFF'
+    )
+    return True
+
+def store_control_command(data):
+    """Queue control command for the next database write"""
+    buffer_write(CONTROL_COMMAND_SQL, (
+        data['device_id'],
+        data['command'],
+        data['value'],
+        data.get('source', 'mqtt'),
+        datetime.now()
+    ))
+    
+    logger.info(
+        "🎛️  Control command queued - Device %s: %s=%s",
+        data['device_id'], data['command'], data['value']
+    )
+    return True
+
+def log_system_event(level, message, source='mqtt_bridge', details=None):
+    """Queue system event for the next database write"""
+    if not SYSTEM_CONFIG['enable_database_logging']:
+        return
+    
+    details_json = _dumps(details) if details else None
+    buffer_write(SYSTEM_LOG_SQL, (level, message, source, details_json, datetime.now()))
+
+def buffer_write(sql, row, device_id=None):
+    """Queue a row for sql; a full batch wakes the flush thread right away
+    
+    device_id marks that device as seen (online) when the batch is written.
+    """
+    global buffered_row_count
+    
+    with write_buffer_lock:
+        write_buffers[sql].append(row)
+        if device_id is not None:
+            devices_seen[device_id] = row[-1]
+        buffered_row_count += 1
+        batch_full = buffered_row_count >= SYSTEM_CONFIG['db_batch_size']
+    
+    if batch_full:
+        # The flush thread does the write so message workers never wait on
+        # the database; without one running, write it here
+        if flush_thread is not None and flush_thread.is_alive():
+            flush_wake.set()
+        else:
+            flush_write_buffers()
+
+def flush_write_buffers(final=False):
+    """Write all queued rows, one executemany and transaction per table
+    
+    Devices whose last_seen is not yet due stay queued; final writes them all.
+    Returns False if the database couldn't be reached; the tables not yet
+    written are then kept for the next flush.
+    """
+    global write_buffers, buffered_row_count
+    
+    with write_buffer_lock:
+        now = time.monotonic()
+        interval = SYSTEM_CONFIG['device_seen_interval']
+        seen = {
+            device_id: last_seen for device_id, last_seen in devices_seen.items()
+            if final or device_id not in devices_written
+            or now - devices_written[device_id] >= interval
+        }
+        if not buffered_row_count and not seen:
+            return True
+        for device_id in seen:
+            del devices_seen[device_id]
+        pending = write_buffers
+        write_buffers = {sql: [] for sql in pending}
+        buffered_row_count = 0
+    
+    remaining = {sql: rows for sql, rows in pending.items() if rows}
+    conn = None
     try:
         conn = get_database_connection()
-        cursor = conn.cursor()
+        cursor = get_database_cursor()
         
-        # Update device status
-        update_device_status(data['device_id'], 'online')
+        # Devices first, so new readings satisfy the foreign key
+        if seen:
+            write_table_rows(conn, cursor, DEVICE_SEEN_SQL, 'devices', [
+                (device_id, f"Device {device_id}", last_seen)
+                for device_id, last_seen in seen.items()
+            ])
+            # Only a committed last_seen holds off the next one for the interval
+            with write_buffer_lock:
+                for device_id in seen:
+                    devices_written[device_id] = now
+            seen = {}
         
-        # Insert sensor reading
-        cursor.execute("""
-            INSERT INTO sensor_readings 
-            (device_id, temperature, humidity, ldr, heater_state, prediction_confidence)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            data['device_id'],
-            data['temperature'],
-            data['humidity'],
-            data['ldr'],
-            data['heater'],
-            data.get('confidence', None)
-        ))
-        
-        reading_id = cursor.lastrowid
-        conn.commit()
-        cursor.close()
-        conn.close()
+        for sql in list(remaining):
+            write_table_rows(conn, cursor, sql, BUFFERED_TABLES[sql], remaining[sql])
+            del remaining[sql]
         
-        logger.info(
-            f"📊 Sensor data stored [ID: {reading_id}] - "
-            f"Device {data['device_id']}: "
-            f"Temp={data['temperature']}°C, "
-            f"Humidity={data['humidity']}%, "
-            f"LDR={data['ldr']}%, "
-            f"Heater={'ON' if data['heater'] else 'OFF'}"
-        )
+        logger.debug("💾 Flushed %d buffered rows", sum(map(len, pending.values())))
         return True
     except mysql.connector.Error as e:
-        logger.error(f"❌ Failed to store sensor reading: {e}")
-        log_system_event('ERROR', f'Failed to store sensor reading: {e}')
+        if conn is not None:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+        release_database_connection()
+        
+        # The devices are due again; a reading queued since is newer and wins
+        with write_buffer_lock:
+            for device_id, last_seen in seen.items():
+                devices_seen.setdefault(device_id, last_seen)
+        
+        # Not log_system_event: it would queue a row for the failing database
+        counts = {sql: len(rows) for sql, rows in remaining.items()}
+        logger.error("❌ Failed to write buffered rows, kept for retry (%s): %s",
+                     describe_row_counts(counts), e)
+        dropped = requeue_write_buffers(remaining)
+        if dropped:
+            logger.error("❌ Write buffer full, dropped oldest rows (%s)", describe_row_counts(dropped))
         return False
 
-def store_control_command(data):
-    """Store control command in database"""
+def write_table_rows(conn, cursor, sql, table, rows):
+    """Insert rows for one table in its own transaction
+    
+    If the server rejects the batch (not a retryable error, e.g. a foreign
+    key or data error), the rows are written one at a time in a new
+    transaction and only those rejected again are dropped. Retryable errors
+    propagate with the table's transaction rolled back by the caller.
+    """
     try:
-        conn = get_database_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO control_commands 
-            (device_id, command_type, command_value, source)
-            VALUES (%s, %s, %s, %s)
-        """, (
-            data['device_id'],
-            data['command'],
-            data['value'],
-            data.get('source', 'mqtt')
-        ))
-        
-        command_id = cursor.lastrowid
+        conn.start_transaction()
+        cursor.executemany(sql, rows)
         conn.commit()
-        cursor.close()
-        conn.close()
-        
-        logger.info(
-            f"🎛️  Control command stored [ID: {command_id}] - "
-            f"Device {data['device_id']}: {data['command']}={data['value']}"
-        )
-        return True
+        return
     except mysql.connector.Error as e:
-        logger.error(f"❌ Failed to store control command: {e}")
-        return False
+        if is_retryable_db_error(e):
+            raise
+        conn.rollback()
+        logger.warning("⚠️  %s batch of %d rows rejected, writing rows one by one: %s",
+                       table, len(rows), e)
+    
+    # A failed statement only undoes itself, so the transaction keeps the
+    # accepted rows and a retryable error still rolls back the whole table
+    dropped = 0
+    conn.start_transaction()
+    for row in rows:
+        try:
+            cursor.execute(sql, row)
+        except mysql.connector.Error as e:
+            if is_retryable_db_error(e):
+                raise
+            dropped += 1
+            logger.error("❌ Dropped %s row %r: %s", table, row, e)
+    conn.commit()
+    if dropped:
+        logger.error("❌ Dropped %d of %d %s rows", dropped, len(rows), table)
 
-def log_system_event(level, message, source='mqtt_bridge', details=None):
-    """Log system event to database"""
-    if not SYSTEM_CONFIG['enable_database_logging']:
+def is_retryable_db_error(e):
+    """True if a later attempt at the same write can succeed (see DB_RETRY_ERRORS)"""
+    return isinstance(e, DB_RETRY_ERRORS) or getattr(e, 'errno', None) in DB_RETRY_ERRNOS
+
+def requeue_write_buffers(pending):
+    """Put the rows of a failed write back ahead of those queued since
+    
+    Each table keeps at most max_buffered_rows, dropping its oldest rows.
+    Returns {sql: dropped row count}.
+    """
+    global buffered_row_count
+    
+    limit = SYSTEM_CONFIG['max_buffered_rows']
+    dropped = {}
+    with write_buffer_lock:
+        for sql, rows in pending.items():
+            if not rows:
+                continue
+            queued = rows + write_buffers[sql]
+            excess = len(queued) - limit
+            if excess > 0:
+                del queued[:excess]
+                dropped[sql] = excess
+            buffered_row_count += len(queued) - len(write_buffers[sql])
+            write_buffers[sql] = queued
+    return dropped
+
+def describe_row_counts(counts):
+    """'sensor_readings: 12, system_logs: 1' for {sql: row count}"""
+    return ', '.join(f"{BUFFERED_TABLES[sql]}: {count}" for sql, count in counts.items() if count)
+
+def archive_sensor_reading(row):
+    """Queue a sensor reading row for its device's packed minute"""
+    key = (row[0], row[-1].replace(second=0, microsecond=0))
+    with write_buffer_lock:
+        archive_buffers.setdefault(key, []).append(row)
+
+def pack_sensor_readings(rows):
+    """Pack sensor reading rows into one compressed blob (see PACKED_READING_FORMAT)"""
+    pack = PACKED_READING_FORMAT.pack
+    blob = b''.join(
+        pack(int(timestamp.timestamp() * 1000), float(temperature), float(humidity), float(ldr),
+             int(heater), float('nan') if confidence is None else float(confidence))
+        for _, temperature, humidity, ldr, heater, confidence, timestamp in rows
+    )
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(blob)
+    return zlib.compress(blob, 3)
+
+def unpack_sensor_readings(blob, codec):
+    """Records (ts_ms, temperature, humidity, ldr, heater_state, confidence) of a packed row"""
+    if codec == 'zstd':
+        data = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        data = zlib.decompress(blob)
+    return list(PACKED_READING_FORMAT.iter_unpack(data))
+
+def flush_archive(final=False):
+    """Write packed rows for every finished minute (every minute if final)"""
+    current_minute = datetime.now().replace(second=0, microsecond=0)
+    
+    with write_buffer_lock:
+        done = [key for key in archive_buffers if final or key[1] < current_minute]
+        pending = [(key, archive_buffers.pop(key)) for key in done]
+    if not pending:
         return
     
+    conn = None
     try:
+        rows = [
+            (device_id, minute, len(readings), ARCHIVE_CODEC, pack_sensor_readings(readings))
+            for (device_id, minute), readings in pending
+        ]
         conn = get_database_connection()
-        cursor = conn.cursor()
+        cursor = get_database_cursor()
         
-        details_json = json.dumps(details) if details else None
+        # Own transaction: if the archive table is missing, only archive rows are lost
+        conn.start_transaction()
+        cursor.executemany(PACKED_READING_SQL, rows)
+        conn.commit()
         
-        cursor.execute("""
-            INSERT INTO system_logs (log_level, message, source, details)
-            VALUES (%s, %s, %s, %s)
-        """, (level, message, source, details_json))
+        logger.debug("🗜️  Archived %d readings in %d packed rows", sum(row[2] for row in rows), len(rows))
+    except (mysql.connector.Error, struct.error, ValueError) as e:
+        if conn is not None:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+        release_database_connection()
         
-        conn.commit()
-        cursor.close()
-        conn.close()
-    except mysql.connector.Error as e:
-        logger.error(f"❌ Failed to log system event: {e}")
+        if isinstance(e, mysql.connector.Error) and is_retryable_db_error(e):
+            logger.error("❌ Failed to write %d packed archive rows, kept for retry: %s", len(pending), e)
+            dropped = requeue_archive(pending)
+            if dropped:
+                logger.error("❌ Archive buffer full, dropped the oldest %d minutes", dropped)
+        else:
+            logger.error("❌ Failed to write %d packed archive rows: %s", len(pending), e)
+
+def requeue_archive(pending):
+    """Put the minutes of a failed archive write back for the next flush
+    
+    At most max_buffered_rows readings are kept, dropping the oldest minutes.
+    Returns the number of minutes dropped.
+    """
+    limit = SYSTEM_CONFIG['max_buffered_rows']
+    dropped = 0
+    with write_buffer_lock:
+        for key, readings in pending:
+            archive_buffers[key] = readings + archive_buffers.get(key, [])
+        
+        total = sum(map(len, archive_buffers.values()))
+        for key in sorted(archive_buffers, key=lambda key: key[1]):
+            if total <= limit:
+                break
+            total -= len(archive_buffers.pop(key))
+            dropped += 1
+    return dropped
+
+def flush_loop():
+    """Background thread: flush buffered rows every db_flush_interval seconds
+    (or as soon as buffer_write reports a full batch)"""
+    while True:
+        flush_wake.wait(SYSTEM_CONFIG['db_flush_interval'])
+        flush_wake.clear()
+        if flush_stop.is_set():
+            break
+        if not flush_write_buffers():
+            # Give the database time to come back before retrying kept rows
+            flush_stop.wait(SYSTEM_CONFIG['db_retry_delay'])
+        flush_archive()
+    release_database_connection()
+
+def start_flush_thread():
+    """Start the background flush thread"""
+    global flush_thread
+    
+    flush_stop.clear()
+    flush_wake.clear()
+    flush_thread = threading.Thread(target=flush_loop, name='db-flush', daemon=True)
+    flush_thread.start()
 
 def close_database_pool():
     """Close all connections in pool"""
     global db_connection_pool
     
+    if flush_thread:
+        flush_stop.set()
+        flush_wake.set()
+        flush_thread.join(timeout=5)
+    
     if db_connection_pool:
+        # Write whatever is still buffered before shutting down
+        flush_write_buffers(final=True)
+        flush_archive(final=True)
+        release_database_connection()
         logger.info("🔒 Closing MySQL connection pool")
 
 # ============================================
@@ -257,16 +733,19 @@ def transform_sensor_data(data):
     # Scale LDR from raw ADC (0-4095) to percentage (0-99)
     if 'ldr' in transformed:
         try:
-            raw_ldr = float(transformed['ldr'])
+            raw_ldr = transformed['ldr']
+            # JSON numbers scale as they are; only other types need float()
+            if type(raw_ldr) is not int and type(raw_ldr) is not float:
+                raw_ldr = float(raw_ldr)
             # Scale: (raw / 4095) * 99
             scaled_ldr = (raw_ldr / 4095.0) * 99.0
             # Clamp to valid range
             scaled_ldr = max(0.0, min(99.0, scaled_ldr))
             transformed['ldr'] = round(scaled_ldr, 2)
             
-            logger.debug(f"🔄 LDR transformed: {raw_ldr} → {transformed['ldr']}%")
+            logger.debug("🔄 LDR transformed: %s → %s%%", raw_ldr, transformed['ldr'])
         except (ValueError, TypeError) as e:
-            logger.warning(f"⚠️  Failed to transform LDR value: {e}")
+            logger.warning("⚠️  Failed to transform LDR value: %s", e)
     
     return transformed
 
@@ -274,67 +753,168 @@ def transform_sensor_data(data):
 # Data Validation Functions
 # ============================================
 
+# VALIDATION_RULES frozen once at import, so a message runs one loop over
+# (field, name, label, min, max) range checks instead of nested dict lookups.
+# Allowed values are frozensets; JSON can deliver unhashable values
+# (lists/objects), so their lookups treat TypeError as not allowed.
+_REQUIRED_FIELDS = ('device_id', 'temperature', 'humidity', 'ldr', 'heater')
+_REQUIRED_FIELD_SET = frozenset(_REQUIRED_FIELDS)
+_RANGE_RULES = tuple(
+    (field, name, label, VALIDATION_RULES[rule]['min'], VALIDATION_RULES[rule]['max'])
+    for field, rule, name, label in (
+        ('temperature', 'temperature', 'temperature', 'Temperature'),
+        ('humidity', 'humidity', 'humidity', 'Humidity'),
+        ('ldr', 'ldr', 'LDR', 'LDR'),
+    )
+)
+_CONFIDENCE_RULE = ('confidence', 'Confidence',
+                    VALIDATION_RULES['prediction_confidence']['min'],
+                    VALIDATION_RULES['prediction_confidence']['max'])
+_DEVICE_IDS = frozenset(VALIDATION_RULES['device_id']['values'])
+_HEATER_STATES = frozenset(VALIDATION_RULES['heater_state']['values'])
+
+def _check_range(value, name, label, low, high):
+    """Error message if value is not a number within [low, high], else None"""
+    # JSON numbers already arrive as float/int and compare directly; only
+    # other types (numeric strings, ...) need coercing
+    if type(value) is not float and type(value) is not int:
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            return f"Invalid {name} value: {value}"
+    if not (low <= value <= high):  # also rejects NaN
+        return f"{label} out of range: {value}"
+    return None
+
 def validate_sensor_data(data):
     """
     Validate sensor data against rules
     Returns: (is_valid, error_message)
     """
-    required_fields = ['device_id', 'temperature', 'humidity', 'ldr', 'heater']
-    
     # Check required fields
-    for field in required_fields:
-        if field not in data:
-            return False, f"Missing required field: {field}"
+    # (one subset test; the ordered scan only runs to name the missing field)
+    if not _REQUIRED_FIELD_SET <= data.keys():
+        for field in _REQUIRED_FIELDS:
+            if field not in data:
+                return False, f"Missing required field: {field}"
     
     # Validate device_id
-    if data['device_id'] not in VALIDATION_RULES['device_id']['values']:
+    try:
+        device_ok = data['device_id'] in _DEVICE_IDS
+    except TypeError:
+        device_ok = False
+    if not device_ok:
         return False, f"Invalid device_id: {data['device_id']}"
     
-    # Validate temperature
+    # Validate temperature, humidity and LDR (an in-range float, the usual
+    # case, is settled inline; _check_range coerces and builds the error)
+    for field, name, label, low, high in _RANGE_RULES:
+        value = data[field]
+        if type(value) is float and low <= value <= high:
+            continue
+        error = _check_range(value, name, label, low, high)
+        if error:
+            return False, error
+    
+    # Validate heater state
     try:
-        temp = float(data['temperature'])
-        if not (VALIDATION_RULES['temperature']['min'] <= temp <= VALIDATION_RULES['temperature']['max']):
-            return False, f"Temperature out of range: {temp}"
-    except (ValueError, TypeError):
-        return False, f"Invalid temperature value: {data['temperature']}"
+        heater_ok = data['heater'] in _HEATER_STATES
+    except TypeError:
+        heater_ok = False
+    if not heater_ok:
+        return False, f"Invalid heater state: {data['heater']}"
+    
+    # Validate confidence (optional)
+    confidence = data.get('confidence')
+    if confidence is not None:
+        error = _check_range(confidence, *_CONFIDENCE_RULE)
+        if error:
+            return False, error
     
-    # Validate humidity
+    return True, None
+
+def validate_control_command(data):
+    """
+    Validate a control command before it is queued (a row the database would
+    reject is dropped at write time)
+    Returns: (is_valid, error_message)
+    """
     try:
-        humidity = float(data['humidity'])
-        if not (VALIDATION_RULES['humidity']['min'] <= humidity <= VALIDATION_RULES['humidity']['max']):
-            return False, f"Humidity out of range: {humidity}"
-    except (ValueError, TypeError):
-        return False, f"Invalid humidity value: {data['humidity']}"
+        device_ok = data['device_id'] in _DEVICE_IDS
+    except TypeError:
+        device_ok = False
+    if not device_ok:
+        return False, f"Invalid device_id: {data['device_id']}"
     
-    # Validate LDR
     try:
-        ldr = float(data['ldr'])
-        if not (VALIDATION_RULES['ldr']['min'] <= ldr <= VALIDATION_RULES['ldr']['max']):
-            return False, f"LDR out of range: {ldr}"
-    except (ValueError, TypeError):
-        return False, f"Invalid LDR value: {data['ldr']}"
+        value_ok = data['value'] in _HEATER_STATES
+    except TypeError:
+        value_ok = False
+    if not value_ok:
+        return False, f"Invalid command value: {data['value']}"
     
-    # Validate heater state
-    if data['heater'] not in VALIDATION_RULES['heater_state']['values']:
-        return False, f"Invalid heater state: {data['heater']}"
+    return True, None
+
+# ============================================
+# ML Lookup Table Functions
+# ============================================
+
+def load_heater_lut():
+    """Memory-map the ML pipeline's heater_lut.npy (axes and scale from heater_lut.json)
     
-    # Validate confidence (optional)
-    if 'confidence' in data and data['confidence'] is not None:
-        try:
-            conf = float(data['confidence'])
-            if not (VALIDATION_RULES['prediction_confidence']['min'] <= conf <= VALIDATION_RULES['prediction_confidence']['max']):
-                return False, f"Confidence out of range: {conf}"
-        except (ValueError, TypeError):
-            return False, f"Invalid confidence value: {data['confidence']}"
+    A relative heater_lut_path is taken from the bridge's directory, not the
+    working directory it was started in.
+    """
+    global heater_lut, heater_lut_axes, heater_lut_scale
     
-    return True, None
+    path = SYSTEM_CONFIG['heater_lut_path']
+    if not path:
+        return False
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    if np is None:
+        logger.warning("⚠️  numpy not installed, heater lookup table disabled")
+        return False
+    
+    try:
+        with open(os.path.splitext(path)[0] + '.json') as f:
+            spec = json.load(f)
+        heater_lut = np.load(path, mmap_mode='r')
+        heater_lut_axes = tuple(
+            (axis['start'], axis['step'], axis['size'])
+            for axis in (spec['axes'][name] for name in ('temperature', 'humidity', 'ldr'))
+        )
+        heater_lut_scale = float(spec['scale'])
+        logger.info("🧠 Heater lookup table loaded: %s %s", path, heater_lut.shape)
+        return True
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("⚠️  Heater lookup table not loaded (%s): %s", path, e)
+        heater_lut = heater_lut_axes = heater_lut_scale = None
+        return False
+
+def lut_confidence(data):
+    """Model confidence in the reported heater state, read from the lookup table
+    
+    Each reading is snapped to the nearest grid point (clamped to the grid).
+    """
+    index = []
+    for value, (start, step, size) in zip(
+            (data['temperature'], data['humidity'], data['ldr']), heater_lut_axes):
+        i = int(round((float(value) - start) / step))
+        index.append(0 if i < 0 else size - 1 if i >= size else i)
+    
+    p_on = int(heater_lut[index[0], index[1], index[2]]) / heater_lut_scale  # plain float for the DB driver
+    return round(p_on if data['heater'] == 1 else 1.0 - p_on, 3)
 
 # ============================================
 # Message Handling Functions
 # ============================================
 
-def handle_sensor_data(data, topic):
-    """Handle sensor data messages"""
+def handle_sensor_data(data, topic, heater_reported=True):
+    """Handle sensor data messages
+    
+    heater_reported is False when the heater state is only a default (the
+    node sent none), so there is no reported state to give a confidence for.
+    """
     # Transform raw data (scale LDR, etc.)
     transformed_data = transform_sensor_data(data)
     
@@ -342,36 +922,58 @@ def handle_sensor_data(data, topic):
     is_valid, error_msg = validate_sensor_data(transformed_data)
     
     if not is_valid:
-        logger.error(f"❌ Validation failed for {topic}: {error_msg}")
+        logger.error("❌ Validation failed for %s: %s", topic, error_msg)
         log_system_event('WARNING', f'Data validation failed: {error_msg}', details=data)
         return
     
-    # Store in database
-    success = store_sensor_reading(transformed_data)
+    # Fill in confidence from the model lookup table if the node sent none
+    if (heater_lut is not None and heater_reported
+            and transformed_data.get('confidence') is None):
+        transformed_data['confidence'] = lut_confidence(transformed_data)
     
-    if not success:
-        logger.error(f"❌ Failed to store sensor data from {topic}")
+    # Queue for the database (write errors are reported by the flush)
+    store_sensor_reading(transformed_data)
+
+_CONTROL_COMMAND_FIELDS = frozenset(('device_id', 'command', 'value'))
 
 def handle_control_command(data, topic):
     """Handle control command messages"""
-    required_fields = ['device_id', 'command', 'value']
+    if not _CONTROL_COMMAND_FIELDS <= data.keys():
+        logger.error("❌ Missing required fields in control command: %s", data)
+        return
     
-    if all(field in data for field in required_fields):
-        store_control_command(data)
-    else:
-        logger.error(f"❌ Missing required fields in control command: {data}")
+    is_valid, error_msg = validate_control_command(data)
+    if not is_valid:
+        logger.error("❌ Validation failed for %s: %s", topic, error_msg)
+        log_system_event('WARNING', f'Control command validation failed: {error_msg}', details=data)
+        return
+    
+    store_control_command(data)
 
 def handle_status_update(data, topic):
     """Handle device status updates"""
     if 'device_id' in data and 'status' in data:
         update_device_status(data['device_id'], data['status'])
     else:
-        logger.error(f"❌ Invalid status update: {data}")
+        logger.error("❌ Invalid status update: %s", data)
 
 # ============================================
 # MQTT Callback Functions
 # ============================================
 
+def set_tcp_nodelay(client):
+    """Disable Nagle on the broker socket (works through TLS sockets too)
+    
+    Small PUBACK/PUBLISH frames are sent at once instead of waiting for
+    the previous segment's ACK.
+    """
+    sock = client.socket()
+    if sock is not None:
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            logger.warning("⚠️  Could not set TCP_NODELAY: %s", e)
+
 def on_connect(client, userdata, flags, rc):
     """Callback when connected to MQTT broker"""
     global is_connected, reconnect_count
@@ -379,12 +981,13 @@ def on_connect(client, userdata, flags, rc):
     if rc == 0:
         is_connected = True
         reconnect_count = 0
+        set_tcp_nodelay(client)
         logger.info("✅ Connected to MQTT broker")
         
-        # Subscribe to all topics
+        # Subscribe to all topics in one SUBSCRIBE packet
+        client.subscribe(MQTT_CONFIG['topics'])
         for topic, qos in MQTT_CONFIG['topics']:
-            client.subscribe(topic, qos)
-            logger.info(f"📡 Subscribed to: {topic} (QoS {qos})")
+            logger.info("📡 Subscribed to: %s (QoS %s)", topic, qos)
         
         log_system_event('INFO', 'MQTT bridge connected to broker')
     else:
@@ -396,7 +999,7 @@ def on_connect(client, userdata, flags, rc):
             5: "Connection refused - not authorized"
         }
         error_msg = error_messages.get(rc, f"Unknown error code: {rc}")
-        logger.error(f"❌ Connection failed: {error_msg}")
+        logger.error("❌ Connection failed: %s", error_msg)
         is_connected = False
 
 def on_disconnect(client, userdata, rc):
@@ -405,159 +1008,270 @@ def on_disconnect(client, userdata, rc):
     
     is_connected = False
     if rc != 0:
-        logger.warning(f"⚠️  Unexpected disconnection (code: {rc})")
+        logger.warning("⚠️  Unexpected disconnection (code: %s)", rc)
         log_system_event('WARNING', f'MQTT bridge disconnected: {rc}')
     else:
         logger.info("🔌 Disconnected from MQTT broker")
 
 # Temporary storage for aggregating individual sensor readings
+# (one dict for all worker threads, so guarded by node_data_lock)
 node_data_buffer = {}
+node_data_lock = threading.Lock()
 
-def on_message(client, userdata, msg):
-    """Callback when message received"""
-    global node_data_buffer
+@functools.lru_cache(maxsize=256)
+def message_queue_for(topic):
+    """Worker queue for a topic (cached, so paho's thread splits each topic once)
     
+    Every message of a device (second topic level, e.g. "node1") goes to the
+    same worker, so its single readings are combined in arrival order.
+    """
+    parts = topic.split('/', 2)
+    key = parts[1] if len(parts) > 1 else topic
+    return message_queues[hash(key) % len(message_queues)]
+
+def on_message(client, userdata, msg):
+    """Callback when message received: queue it for the worker threads"""
+    topic = msg.topic
     try:
-        topic = msg.topic
-        payload = msg.payload.decode('utf-8')
-        
-        logger.debug(f"📨 Message received on {topic}: {payload}")
+        message_queue_for(topic).put_nowait((topic, msg.payload))
+    except queue.Full:
+        logger.warning("⚠️  Message queue full, dropping message on %s", topic)
+
+def message_worker(message_queue):
+    """Worker thread: process queued messages until a None sentinel arrives"""
+    while True:
+        item = message_queue.get()
+        if item is None:
+            break
+        process_message(*item)
+    release_database_connection()
+
+def start_message_workers():
+    """Start the threads that process received messages"""
+    for i, message_queue in enumerate(message_queues):
+        worker = threading.Thread(target=message_worker, args=(message_queue,),
+                                  name=f'mqtt-worker-{i + 1}', daemon=True)
+        worker.start()
+        worker_threads.append(worker)
+
+def stop_message_workers():
+    """Let the workers finish the queued messages, then stop them"""
+    if worker_threads:
+        for message_queue in message_queues:
+            message_queue.put(None)
+    for worker in worker_threads:
+        worker.join(timeout=5)
+    worker_threads.clear()
+
+def parse_device_id(segment):
+    """Device ID from a topic segment like "node1" or "device1", else None"""
+    for prefix in DEVICE_TOPIC_PREFIXES:
+        if segment.startswith(prefix):
+            try:
+                return int(segment[len(prefix):])
+            except ValueError:
+                return None
+    return None
+
+def handle_sensor_packet(device_id, payload, topic):
+    """Handle a complete JSON sensor packet (poultry/node1/data)"""
+    try:
+        data = _loads(payload)
+    except JSONDecodeError as e:
+        logger.error("❌ Invalid JSON payload on %s: %s", topic, e)
+        return
+    if not isinstance(data, dict):
+        logger.error("❌ Invalid JSON payload on %s: expected an object", topic)
+        return
+    
+    # Ensure device_id is set
+    if 'node_id' in data:
+        data['device_id'] = data['node_id']
+    elif 'device_id' not in data:
+        data['device_id'] = device_id
+    
+    # Ensure all required fields exist
+    if 'temperature' in data and 'humidity' in data and 'light' in data:
+        # Map 'light' to 'ldr' if needed
+        if 'ldr' not in data:
+            data['ldr'] = data['light']
         
-        # Route message based on topic pattern
-        # New format: poultry/node1/data, poultry/node1/temperature, etc.
-        # Old format: poultry/device1/sensors
+        # Set heater to 0 if not present (since ML handles it now)
+        heater_reported = 'heater' in data or 'device_state' in data
+        if 'heater' not in data:
+            data['heater'] = data.get('device_state', 0)
         
-        if 'control' in topic:
-            try:
-                data = json.loads(payload)
-                handle_control_command(data, topic)
-            except json.JSONDecodeError as e:
-                logger.error(f"❌ Invalid JSON payload on {topic}: {e}")
-            return
+        # Handle the complete sensor data
+        handle_sensor_data(data, topic, heater_reported)
+    else:
+        logger.warning("⚠️  Incomplete data packet on %s: %s", topic, data)
+
+# Compact binary reading for nodes where payload size matters (14 bytes vs
+# ~80 for the JSON packet): little-endian uint8 device_id (0 = take it from
+# the topic), float32 temperature, humidity, ldr (raw ADC, scaled like the
+# JSON "light"), int8 heater
+BINARY_READING_FORMAT = struct.Struct('<Bfffb')
+
+def handle_sensor_binary(device_id, payload, topic):
+    """Handle a packed binary sensor reading (poultry/node1/bin)"""
+    if len(payload) != BINARY_READING_FORMAT.size:
+        logger.error("❌ Invalid binary payload on %s: %d bytes, expected %d",
+                     topic, len(payload), BINARY_READING_FORMAT.size)
+        return
+    
+    payload_device_id, temperature, humidity, ldr, heater = BINARY_READING_FORMAT.unpack(payload)
+    
+    # float32 -> 2 decimals, the precision the database stores
+    handle_sensor_data({
+        'device_id': payload_device_id or device_id,
+        'temperature': round(temperature, 2),
+        'humidity': round(humidity, 2),
+        'ldr': round(ldr, 2),
+        'heater': heater
+    }, topic)
+
+def handle_sensor_value(device_id, field, payload, topic):
+    """Handle a single reading (poultry/node1/temperature), storing it once
+    the device has reported temperature, humidity and light"""
+    try:
+        value = float(payload)
+    except ValueError:
+        logger.error("❌ Invalid numeric value on %s: %r", topic, payload)
+        return
+    
+    complete = None
+    
+    with node_data_lock:
+        # Initialize buffer for this device if not exists
+        if device_id not in node_data_buffer:
+            node_data_buffer[device_id] = {
+                'device_id': device_id,
+                'temperature': None,
+                'humidity': None,
+                'ldr': None,
+                'heater': 0,  # Default to OFF since ML controls it
+                'last_update': time.time()
+            }
         
-        if 'status' in topic:
-            try:
-                data = json.loads(payload)
-                handle_status_update(data, topic)
-            except json.JSONDecodeError as e:
-                logger.error(f"❌ Invalid JSON payload on {topic}: {e}")
-            return
+        # Update the specific field
+        buffer = node_data_buffer[device_id]
+        buffer[field] = value
+        buffer['last_update'] = time.time()
         
-        # Handle sensor data topics
-        if 'node' in topic or 'device' in topic:
-            # Extract node/device ID from topic
-            # Format: poultry/node1/data or poultry/device1/sensors
-            parts = topic.split('/')
+        # Check if we have all required fields
+        if (buffer['temperature'] is not None and 
+            buffer['humidity'] is not None and 
+            buffer['ldr'] is not None):
             
-            if len(parts) >= 2:
-                node_part = parts[1]  # e.g., "node1" or "device1"
-                
-                # Extract numeric ID
-                device_id = None
-                if 'node' in node_part:
-                    device_id = int(node_part.replace('node', ''))
-                elif 'device' in node_part:
-                    device_id = int(node_part.replace('device', ''))
-                
-                if device_id is None:
-                    logger.warning(f"⚠️  Could not extract device ID from topic: {topic}")
-                    return
-                
-                # Check if this is a complete data packet (JSON)
-                if '/data' in topic or '/sensors' in topic:
-                    try:
-                        data = json.loads(payload)
-                        
-                        # Ensure device_id is set
-                        if 'node_id' in data:
-                            data['device_id'] = data['node_id']
-                        elif 'device_id' not in data:
-                            data['device_id'] = device_id
-                        
-                        # Ensure all required fields exist
-                        if 'temperature' in data and 'humidity' in data and 'light' in data:
-                            # Map 'light' to 'ldr' if needed
-                            if 'ldr' not in data and 'light' in data:
-                                data['ldr'] = data['light']
-                            
-                            # Set heater to 0 if not present (since ML handles it now)
-                            if 'heater' not in data:
-                                data['heater'] = data.get('device_state', 0)
-                            
-                            # Handle the complete sensor data
-                            handle_sensor_data(data, topic)
-                        else:
-                            logger.warning(f"⚠️  Incomplete data packet on {topic}: {data}")
-                    
-                    except json.JSONDecodeError as e:
-                        logger.error(f"❌ Invalid JSON payload on {topic}: {e}")
-                
-                # Handle individual sensor readings (temperature, humidity, light)
-                elif '/temperature' in topic or '/humidity' in topic or '/light' in topic:
-                    # Initialize buffer for this device if not exists
-                    if device_id not in node_data_buffer:
-                        node_data_buffer[device_id] = {
-                            'device_id': device_id,
-                            'temperature': None,
-                            'humidity': None,
-                            'ldr': None,
-                            'heater': 0,  # Default to OFF since ML controls it
-                            'last_update': time.time()
-                        }
-                    
-                    # Update the specific field
-                    try:
-                        value = float(payload)
-                        
-                        if '/temperature' in topic:
-                            node_data_buffer[device_id]['temperature'] = value
-                        elif '/humidity' in topic:
-                            node_data_buffer[device_id]['humidity'] = value
-                        elif '/light' in topic:
-                            node_data_buffer[device_id]['ldr'] = value
-                        
-                        node_data_buffer[device_id]['last_update'] = time.time()
-                        
-                        # Check if we have all required fields
-                        buffer = node_data_buffer[device_id]
-                        if (buffer['temperature'] is not None and 
-                            buffer['humidity'] is not None and 
-                            buffer['ldr'] is not None):
-                            
-                            # We have complete data, store it
-                            handle_sensor_data(buffer.copy(), topic)
-                            
-                            # Reset buffer for this device
-                            node_data_buffer[device_id] = {
-                                'device_id': device_id,
-                                'temperature': None,
-                                'humidity': None,
-                                'ldr': None,
-                                'heater': 0,
-                                'last_update': time.time()
-                            }
-                    
-                    except ValueError:
-                        logger.error(f"❌ Invalid numeric value on {topic}: {payload}")
-                
-                else:
-                    logger.warning(f"⚠️  Unknown sensor topic pattern: {topic}")
-            else:
-                logger.warning(f"⚠️  Invalid topic format: {topic}")
-        
-        # Handle old format for backward compatibility
-        elif 'sensors' in topic:
-            try:
-                data = json.loads(payload)
-                handle_sensor_data(data, topic)
-            except json.JSONDecodeError as e:
-                logger.error(f"❌ Invalid JSON payload on {topic}: {e}")
+            complete = buffer
+            
+            # Reset buffer for this device
+            node_data_buffer[device_id] = {
+                'device_id': device_id,
+                'temperature': None,
+                'humidity': None,
+                'ldr': None,
+                'heater': 0,
+                'last_update': time.time()
+            }
+    
+    # We have complete data, store it (outside the lock)
+    if complete is not None:
+        handle_sensor_data(complete, topic, heater_reported=False)  # single readings carry no heater state
+
+# Topic routing tables, so a message costs one split and a dict lookup or
+# two instead of substring scans of the whole topic.
+# poultry/<segment> carrying a JSON object -> handler(data, topic)
+# (poultry/sensors is the old format, device ID inside the payload)
+JSON_TOPIC_ROUTES = {
+    'control': handle_control_command,
+    'status': handle_status_update,
+    'sensors': handle_sensor_data,
+}
+# poultry/node1/<leaf> or poultry/device1/<leaf>
+DEVICE_TOPIC_PREFIXES = ('node', 'device')
+SENSOR_TOPIC_HANDLERS = {
+    'data': handle_sensor_packet,
+    'sensors': handle_sensor_packet,
+    'bin': handle_sensor_binary,
+}
+READING_TOPIC_FIELDS = {
+    'temperature': 'temperature',
+    'humidity': 'humidity',
+    'light': 'ldr',
+}
+
+def handle_json_message(handler, payload, topic):
+    """Parse a JSON object payload and pass it to handler(data, topic)"""
+    try:
+        data = _loads(payload)
+    except JSONDecodeError as e:
+        logger.error("❌ Invalid JSON payload on %s: %s", topic, e)
+        return
+    # Handlers index the payload as a dict
+    if not isinstance(data, dict):
+        logger.error("❌ Invalid JSON payload on %s: expected an object", topic)
+        return
+    handler(data, topic)
+
+def warn_topic(warning, payload, topic):
+    """Route for topics that can't be handled"""
+    logger.warning("%s: %s", warning, topic)
+
+@functools.lru_cache(maxsize=256)
+def route_topic(topic):
+    """Resolve a topic to the handler it is routed to, called as handler(payload, topic)
+    
+    The bridge sees the same handful of topics over and over, so each is
+    parsed once and later messages take the cached route.
+    """
+    parts = topic.split('/')
+    segment = parts[1] if len(parts) >= 2 else ''
+    
+    handler = JSON_TOPIC_ROUTES.get(segment)
+    if handler is not None:
+        return functools.partial(handle_json_message, handler)
+    
+    # Sensor data topics
+    if not segment.startswith(DEVICE_TOPIC_PREFIXES):
+        return functools.partial(warn_topic, "⚠️  Unknown topic")
+    
+    device_id = parse_device_id(segment)
+    if device_id is None:
+        return functools.partial(warn_topic, "⚠️  Could not extract device ID from topic")
+    
+    leaf = parts[2] if len(parts) >= 3 else ''
+    handler = SENSOR_TOPIC_HANDLERS.get(leaf)
+    if handler is not None:
+        return functools.partial(handler, device_id)
+    
+    field = READING_TOPIC_FIELDS.get(leaf)
+    if field is not None:
+        return functools.partial(handle_sensor_value, device_id, field)
+    return functools.partial(warn_topic, "⚠️  Unknown sensor topic pattern")
+
+def process_message(topic, payload):
+    """Decode a received message and route it by topic
+    
+    Formats: poultry/node1/data (JSON packet), poultry/node1/bin (binary
+    packet), poultry/node1/temperature (single reading),
+    poultry/device1/sensors and poultry/sensors (old), poultry/control/...,
+    poultry/status
+    """
+    try:
+        # payload stays bytes: the JSON parser and float() take it directly,
+        # and the debug line only formats it (as a bytes repr) if DEBUG is on
+        logger.debug("📨 Message received on %s: %r", topic, payload)
         
-        else:
-            logger.warning(f"⚠️  Unknown topic: {topic}")
+        route_topic(topic)(payload, topic)
     
+    except (KeyError, TypeError, ValueError) as e:
+        # Malformed payloads: a publisher flooding them shouldn't cost a
+        # traceback each (JSON syntax errors are reported by the handlers)
+        logger.error("❌ Error processing message on %s: %r", topic, e)
+        log_system_event('ERROR', f'Error processing message: {e!r}')
     except Exception as e:
-        logger.error(f"❌ Error processing message: {e}", exc_info=True)
+        logger.error("❌ Error processing message: %s", e, exc_info=True)
         log_system_event('ERROR', f'Error processing message: {e}')
 
 # ============================================
@@ -578,6 +1292,13 @@ def initialize_mqtt_client():
     mqtt_client.on_message = on_message
     mqtt_client.on_disconnect = on_disconnect
     
+    # Dropped connections are retried by paho's loop thread, doubling the
+    # delay from reconnect_delay up to max_reconnect_delay
+    mqtt_client.reconnect_delay_set(
+        min_delay=SYSTEM_CONFIG['reconnect_delay'],
+        max_delay=SYSTEM_CONFIG['max_reconnect_delay']
+    )
+    
     # Set authentication if configured
     if MQTT_CONFIG['username'] and MQTT_CONFIG['password']:
         mqtt_client.username_pw_set(MQTT_CONFIG['username'], MQTT_CONFIG['password'])
@@ -594,12 +1315,17 @@ def initialize_mqtt_client():
     return mqtt_client
 
 def connect_to_mqtt_broker():
-    """Connect to MQTT broker with retry logic"""
+    """Connect to MQTT broker with retry logic
+    
+    Retries back off exponentially from reconnect_delay up to
+    max_reconnect_delay, with jitter so bridges restarted together don't
+    all hit the broker at the same moment.
+    """
     global reconnect_count, mqtt_client
     
     while reconnect_count < SYSTEM_CONFIG['max_reconnect_attempts']:
         try:
-            logger.info(f"🔌 Connecting to MQTT broker at {MQTT_CONFIG['broker']}:{MQTT_CONFIG['port']}")
+            logger.info("🔌 Connecting to MQTT broker at %s:%s", MQTT_CONFIG['broker'], MQTT_CONFIG['port'])
             mqtt_client.connect(
                 MQTT_CONFIG['broker'],
                 MQTT_CONFIG['port'],
@@ -608,35 +1334,50 @@ def connect_to_mqtt_broker():
             return True
         except Exception as e:
             reconnect_count += 1
-            logger.error(f"❌ Connection attempt {reconnect_count} failed: {e}")
+            logger.error("❌ Connection attempt %d failed: %s", reconnect_count, e)
             if reconnect_count < SYSTEM_CONFIG['max_reconnect_attempts']:
-                logger.info(f"⏳ Retrying in {SYSTEM_CONFIG['reconnect_delay']} seconds...")
-                time.sleep(SYSTEM_CONFIG['reconnect_delay'])
+                delay = min(SYSTEM_CONFIG['max_reconnect_delay'],
+                            SYSTEM_CONFIG['reconnect_delay'] * 2 ** (reconnect_count - 1))
+                delay *= 0.5 + random.random()
+                logger.info("⏳ Retrying in %.1f seconds...", delay)
+                if bridge_stop.wait(delay):  # interrupted by a signal
+                    return False
     
     logger.critical("❌ Max reconnection attempts reached. Exiting.")
     return False
 
 def start_mqtt_loop():
-    """Start MQTT client loop"""
+    """Start MQTT client loop
+    
+    paho's network loop runs in its own thread; the main thread just waits
+    (in short steps, so signals are still handled on Windows too) until a
+    signal sets bridge_stop, then shuts down and flushes buffered rows here
+    rather than inside the signal handler.
+    """
     global mqtt_client
     
     try:
         logger.info("🚀 Starting MQTT bridge...")
-        mqtt_client.loop_forever()
+        start_message_workers()
+        mqtt_client.loop_start()
+        while not bridge_stop.wait(1):
+            pass
     except KeyboardInterrupt:
         logger.info("⏹️  MQTT bridge stopped by user")
-        stop_mqtt_bridge()
     except Exception as e:
-        logger.error(f"❌ MQTT bridge error: {e}", exc_info=True)
-        stop_mqtt_bridge()
+        logger.error("❌ MQTT bridge error: %s", e, exc_info=True)
+    stop_mqtt_bridge()
 
 def stop_mqtt_bridge():
     """Stop MQTT client gracefully"""
     global mqtt_client
     
     logger.info("🛑 Stopping MQTT bridge...")
+    bridge_stop.set()
     if mqtt_client:
         mqtt_client.disconnect()
+        mqtt_client.loop_stop()
+    stop_message_workers()
     close_database_pool()
     logger.info("✅ MQTT bridge stopped")
 
@@ -645,10 +1386,14 @@ def stop_mqtt_bridge():
 # ============================================
 
 def signal_handler(sig, frame):
-    """Handle Ctrl+C gracefully"""
-    logger.info("\n⏹️  Received interrupt signal. Shutting down...")
-    stop_mqtt_bridge()
-    sys.exit(0)
+    """Handle Ctrl+C/SIGTERM gracefully
+    
+    Only wakes the main loop; start_mqtt_loop() does the shutdown and
+    final flush, so a second signal can't re-enter it half way through.
+    """
+    if not bridge_stop.is_set():
+        logger.info("\n⏹️  Received interrupt signal. Shutting down...")
+        bridge_stop.set()
 
 def print_banner():
     """Print startup banner"""
@@ -674,8 +1419,9 @@ def main():
     # Initialize logger first
     logger = setup_logging()
     
-    # Register signal handler
+    # Register signal handlers (SIGTERM too, so service stops flush buffered rows)
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
     
     # Print banner
     print_banner()
@@ -687,6 +1433,9 @@ def main():
             logger.critical("❌ Failed to initialize database")
             sys.exit(1)
         
+        # Optional ML lookup table for prediction confidence
+        load_heater_lut()
+        
         # Initialize MQTT client
         logger.info("📡 Initializing MQTT bridge...")
         initialize_mqtt_client()
@@ -694,9 +1443,9 @@ def main():
         # Connect to MQTT broker
         if connect_to_mqtt_broker():
             logger.info("✅ MQTT Bridge initialized successfully")
-            logger.info(f"📊 Database: {MYSQL_CONFIG['database']}@{MYSQL_CONFIG['host']}")
-            logger.info(f"📡 MQTT Broker: {MQTT_CONFIG['broker']}:{MQTT_CONFIG['port']}")
-            logger.info(f"🎯 Subscribed to {len(MQTT_CONFIG['topics'])} topics")
+            logger.info("📊 Database: %s@%s", MYSQL_CONFIG['database'], MYSQL_CONFIG['host'])
+            logger.info("📡 MQTT Broker: %s:%s", MQTT_CONFIG['broker'], MQTT_CONFIG['port'])
+            logger.info("🎯 Subscribed to %d topics", len(MQTT_CONFIG['topics']))
             logger.info("")
             logger.info("Press Ctrl+C to stop...")
             logger.info("=" * 80)
@@ -704,13 +1453,16 @@ def main():
             
             # Start the MQTT loop
             start_mqtt_loop()
+        elif bridge_stop.is_set():
+            # Interrupted while still retrying the connection
+            close_database_pool()
         else:
             logger.critical("❌ Failed to connect to MQTT broker")
             close_database_pool()
             sys.exit(1)
     
     except Exception as e:
-        logger.critical(f"❌ Fatal error: {e}", exc_info=True)
+        logger.critical("❌ Fatal error: %s", e, exc_info=True)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -5,10 +5,23 @@ Publishes test sensor data to MQTT broker for testing the bridge
 
 import paho.mqtt.client as mqtt
 import json
+import struct
 import time
 import random
+import socket
+import sys
+import threading
 from datetime import datetime
 
+try:
+    import orjson
+    # Serializes datetime natively (naive, like isoformat()) and returns
+    # bytes, which paho publishes as-is
+    _dumps = orjson.dumps
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    def _dumps(obj):
+        return json.dumps(obj, default=datetime.isoformat).encode()
+
 # ============================================
 # Configuration
 # ============================================
@@ -16,28 +29,48 @@ from datetime import datetime
 MQTT_BROKER = 'localhost'
 MQTT_PORT = 1883
 PUBLISH_INTERVAL = 5  # seconds
+DEVICE_IDS = (1, 2, 3)
+VERBOSE = False  # Print every reading in continuous mode (single publish always does)
+BINARY_PAYLOADS = False  # Send readings as packed structs on poultry/nodeN/bin instead of JSON
+
+# Per-device topics, built once rather than formatted on every publish
+SENSOR_TOPICS = {device_id: f"poultry/device{device_id}/sensors" for device_id in DEVICE_IDS}
+CONTROL_TOPICS = {device_id: f"poultry/control/device{device_id}" for device_id in DEVICE_IDS}
+BINARY_TOPICS = {device_id: f"poultry/node{device_id}/bin" for device_id in DEVICE_IDS}
+
+# Same layout as the bridge's BINARY_READING_FORMAT: device_id, temperature,
+# humidity, ldr as raw ADC (0-4095, the bridge scales it to 0-99%), heater
+# (14 bytes instead of ~150 of JSON; no confidence)
+BINARY_READING_FORMAT = struct.Struct('<Bfffb')
 
 # ============================================
 # Test Data Generator
 # ============================================
 
+# Bound once; generate_sensor_data draws four values per call
+_uniform = random.uniform
+
 def generate_sensor_data(device_id):
     """Generate realistic sensor data"""
+    uniform = _uniform
+    
     # Temperature: 18-38°C (realistic poultry range)
-    temperature = round(random.uniform(18.0, 38.0), 2)
+    temperature = round(uniform(18.0, 38.0), 2)
     
     # Humidity: 60-100% (poultry farms tend to be humid)
-    humidity = round(random.uniform(60.0, 100.0), 2)
+    humidity = round(uniform(60.0, 100.0), 2)
     
     # LDR: 0-100 (light intensity)
-    ldr = round(random.uniform(0.0, 100.0), 2)
+    ldr = round(uniform(0.0, 100.0), 2)
     
     # Heater state: Simple logic (ON if temp < 25°C or humidity > 85%)
     heater = 1 if (temperature < 25.0 or humidity > 85.0) else 0
     
     # ML confidence: 0.70-0.99
-    confidence = round(random.uniform(0.70, 0.99), 3)
+    confidence = round(uniform(0.70, 0.99), 3)
     
+    # A fresh dict per reading (callers may keep it); the timestamp is Unix
+    # epoch seconds, which the bridge ignores (it stamps rows on receipt)
     return {
         "device_id": device_id,
         "temperature": temperature,
@@ -45,7 +78,7 @@ def generate_sensor_data(device_id):
         "ldr": ldr,
         "heater": heater,
         "confidence": confidence,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": time.time()
     }
 
 # ============================================
@@ -53,35 +86,39 @@ def generate_sensor_data(device_id):
 # ============================================
 
 class TestPublisher:
-    def __init__(self):
+    __slots__ = ('client', 'connected', 'qos')  # read on every publish
+    
+    def __init__(self, default_qos=0):
         self.client = mqtt.Client(client_id="test_publisher")
         self.client.on_connect = self.on_connect
-        self.client.on_publish = self.on_publish
-        self.connected = False
+        self.connected = threading.Event()  # set by on_connect
+        # Simulated readings are interchangeable samples, so by default they
+        # go out at QoS 0 without waiting for a PUBACK each
+        self.qos = default_qos
     
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
-            self.connected = True
+            # Disable Nagle so the back-to-back readings of a round go out
+            # at once instead of waiting on the previous segment's ACK
+            sock = client.socket()
+            if sock is not None:
+                try:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                except OSError as e:
+                    print(f"⚠️  Could not set TCP_NODELAY: {e}")
+            self.connected.set()
             print("✅ Connected to MQTT broker")
         else:
             print(f"❌ Connection failed with code: {rc}")
     
-    def on_publish(self, client, userdata, mid):
-        print(f"📤 Message published (mid: {mid})")
-    
     def connect(self):
         try:
             print(f"🔌 Connecting to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}...")
             self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
             self.client.loop_start()
             
-            # Wait for connection
-            timeout = 5
-            start_time = time.time()
-            while not self.connected and (time.time() - start_time) < timeout:
-                time.sleep(0.1)
-            
-            if self.connected:
+            # Wait for on_connect (returns as soon as it fires)
+            if self.connected.wait(timeout=5):
                 return True
             else:
                 print("❌ Connection timeout")
@@ -90,36 +127,56 @@ class TestPublisher:
             print(f"❌ Connection error: {e}")
             return False
     
-    def publish_sensor_data(self, device_id):
-        """Publish sensor data for a device"""
+    def publish_sensor_data(self, device_id, verbose=None):
+        """Publish sensor data for a device (printed if verbose, default VERBOSE)"""
         data = generate_sensor_data(device_id)
-        topic = f"poultry/device{device_id}/sensors"
-        payload = json.dumps(data)
+        if BINARY_PAYLOADS:
+            topic = BINARY_TOPICS.get(device_id) or f"poultry/node{device_id}/bin"
+            payload = BINARY_READING_FORMAT.pack(
+                device_id, data['temperature'], data['humidity'],
+                data['ldr'] / 99.0 * 4095.0, data['heater'])
+        else:
+            topic = SENSOR_TOPICS.get(device_id) or f"poultry/device{device_id}/sensors"
+            payload = _dumps(data)
         
-        result = self.client.publish(topic, payload, qos=1)
+        result = self.client.publish(topic, payload, qos=self.qos)
         
-        print(f"\n📊 Published to {topic}:")
-        print(f"   Device: {data['device_id']}")
-        print(f"   Temperature: {data['temperature']}°C")
-        print(f"   Humidity: {data['humidity']}%")
-        print(f"   LDR: {data['ldr']}%")
-        print(f"   Heater: {'ON' if data['heater'] else 'OFF'}")
-        print(f"   Confidence: {data['confidence']}")
+        if verbose is None:
+            verbose = VERBOSE
+        if verbose:
+            # One write for the whole block instead of a print() per line
+            sys.stdout.write(
+                f"\n📊 Published to {topic}:\n"
+                f"   Device: {data['device_id']}\n"
+                f"   Temperature: {data['temperature']}°C\n"
+                f"   Humidity: {data['humidity']}%\n"
+                f"   LDR: {data['ldr']}%\n"
+                f"   Heater: {'ON' if data['heater'] else 'OFF'}\n"
+                f"   Confidence: {data['confidence']}\n"
+            )
         
         return result.rc == mqtt.MQTT_ERR_SUCCESS
     
-    def publish_control_command(self, device_id, command, value):
-        """Publish control command"""
+    def publish_sensor_round(self, device_ids=DEVICE_IDS, verbose=None):
+        """Publish one reading per device, back to back
+        
+        With no pause in between, paho's network thread sends the PUBLISH
+        frames together instead of one write per device every 0.5 s.
+        """
+        return all([self.publish_sensor_data(device_id, verbose) for device_id in device_ids])
+    
+    def publish_control_command(self, device_id, command, value, qos=1):
+        """Publish control command (QoS 1 by default: commands must arrive)"""
         data = {
             "device_id": device_id,
             "command": command,
             "value": value,
             "source": "test_publisher"
         }
-        topic = f"poultry/control/device{device_id}"
-        payload = json.dumps(data)
+        topic = CONTROL_TOPICS.get(device_id) or f"poultry/control/device{device_id}"
+        payload = _dumps(data)
         
-        result = self.client.publish(topic, payload, qos=1)
+        result = self.client.publish(topic, payload, qos=qos)
         print(f"\n🎛️  Published control command to {topic}: {command}={value}")
         
         return result.rc == mqtt.MQTT_ERR_SUCCESS
@@ -129,12 +186,12 @@ class TestPublisher:
         data = {
             "device_id": device_id,
             "status": status,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now()
         }
         topic = "poultry/status"
-        payload = json.dumps(data)
+        payload = _dumps(data)
         
-        result = self.client.publish(topic, payload, qos=1)
+        result = self.client.publish(topic, payload, qos=self.qos)
         print(f"\n📡 Published status to {topic}: Device {device_id} is {status}")
         
         return result.rc == mqtt.MQTT_ERR_SUCCESS
@@ -157,17 +214,27 @@ def test_continuous_publishing(publisher):
     
     try:
         iteration = 1
+        # Rounds are scheduled on a fixed grid, so publishing time doesn't
+        # stretch the period beyond PUBLISH_INTERVAL
+        next_round = time.monotonic()
         while True:
-            print(f"\n--- Iteration {iteration} ---")
-            
             # Publish data for all 3 devices
-            for device_id in [1, 2, 3]:
-                publisher.publish_sensor_data(device_id)
-                time.sleep(0.5)  # Small delay between devices
+            ok = publisher.publish_sensor_round()
+            
+            # One line per iteration (set VERBOSE to see every reading)
+            print(f"{'📊' if ok else '⚠️ '} Iteration {iteration}: "
+                  f"{len(DEVICE_IDS)} readings {'published' if ok else 'NOT all published'}, "
+                  f"next in {PUBLISH_INTERVAL}s")
             
             iteration += 1
-            print(f"\n⏳ Waiting {PUBLISH_INTERVAL} seconds...")
-            time.sleep(PUBLISH_INTERVAL)
+            next_round += PUBLISH_INTERVAL
+            delay = next_round - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind (e.g. the machine was suspended): restart the
+                # grid from now rather than publishing a burst to catch up
+                next_round = time.monotonic()
     
     except KeyboardInterrupt:
         print("\n\n⏹️  Stopped by user")
@@ -178,9 +245,7 @@ def test_single_publish(publisher):
     print("📤 Publishing single round of data")
     print("="*80)
     
-    for device_id in [1, 2, 3]:
-        publisher.publish_sensor_data(device_id)
-        time.sleep(0.5)
+    publisher.publish_sensor_round(verbose=True)
     
     print("\n✅ Single publish complete")
 